@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the compiled converter plan against the composed
+`CONVERTERS` chains of `barco.itrack.parser`.
+
+Run with `python benchmarks/bench_converters.py`.
+"""
+import timeit
+
+from barco.itrack.parser import CONVERTERS, compile_plan
+
+NUMBER = 20
+
+
+def _fields(i):
+    return dict(
+        assignee=dict(name='user{:d}'.format(i % 7)),
+        summary='Issue {:d}'.format(i),
+        status=dict(name='In Progress'),
+        issuetype=dict(name='Software Defect'),
+        project=dict(name='PROJECT'),
+        priority=dict(name='P2 - High'),
+        customfield_10002=dict(value='S2 - Major'),
+        customfield_10021=dict(value='Integration'),
+        customfield_10232='2018-01-02T10:00:00.000+0100',
+        customfield_10350=None,
+        fixVersions=[dict(name='1.0', archived=False),
+                     dict(name='0.9', archived=True)],
+        versions=[dict(name='0.8', archived=False)],
+        created='2018-01-01T10:00:00.000+0100',
+        resolutiondate=None,
+        updated='2018-03-01T10:00:00.000+0100',
+        reported=dict(name='reporter'),
+    )
+
+
+def composed(issues):
+    return [{k: f(fields[k]) for k, f in CONVERTERS.items() if k in fields}
+            for fields in issues]
+
+
+def compiled(issues):
+    convert = compile_plan()
+    return [convert(fields) for fields in issues]
+
+
+def main(n=10000):
+    issues = [_fields(i) for i in range(n)]
+    assert composed(issues) == compiled(issues)
+
+    results = {}
+    for func in (composed, compiled):
+        seconds = min(timeit.repeat(lambda: func(issues), number=NUMBER,
+                                    repeat=3)) / NUMBER
+        results[func.__name__] = seconds
+        print('{:<10} {:8.1f} ms {:10.0f} issues/s'.format(
+            func.__name__, seconds * 1e3, n / seconds))
+
+    print('speedup    {:8.2f}x'.format(results['composed'] / results['compiled']))
+
+
+if __name__ == '__main__':
+    main()
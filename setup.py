@@ -20,5 +20,9 @@ setup(
         'xlrd',
         'numpy',
         'pandas'
-    ]
+    ],
+    extras_require={
+        'async': ['aiohttp'],
+        'notebook': ['ipython']
+    }
 )
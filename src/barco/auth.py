@@ -1,17 +1,18 @@
 import os
 
-from .utils.crypto import LightCypher
 
 class BasicAuth(tuple):
 
     @classmethod
     def from_env(cls, key):
+        from .utils.crypto import LightCypher
         user = os.getenv(key + '_USER', '')
         token = os.getenv(key + '_PASSWORD', '').encode('utf-8')
         password = LightCypher().decrypt(token)
         return cls([user, password])
 
     def __repr__(self):
+        from .utils.crypto import LightCypher
         user, password = self
         token = LightCypher().encrypt(password)
         return '<BasicAuth {} {}>'.format(user, token.decode('utf-8'))
@@ -1,2 +1,2 @@
 """Provides functions to load data from iTrack REST API."""
-from .api import search
+from .api import search, search_chunks
@@ -0,0 +1,169 @@
+"""Provides asyncio functions to load data from iTrack REST API."""
+import asyncio
+import base64
+import logging
+
+import aiohttp
+from traitlets import (HasTraits, TCPAddress, Instance, Int, List, Unicode,
+                       default)
+
+from ..types import Auth
+from ..utils.jsonstream import loads
+from .api import to_frame
+from .proxy import POOL_SIZE, parse_search_result, search_url
+
+# Logger instance
+_logger = logging.getLogger(__name__)
+
+
+class AsyncITrackProxy(HasTraits):
+    """An asyncio proxy to the iTrack ReST API."""
+
+    server = TCPAddress(help='TCP address of the ReST API server')
+    scheme = Unicode('https', help='URL scheme of the ReST API server')
+    auth = Auth(help='Auth tuple to enable Basic/Digest/Custom HTTP Auth.')
+    fields = List(Unicode(), help='Names of additional fields to request')
+    session = Instance(aiohttp.ClientSession,
+                       help='HTTP session to send requests')
+    pool_size = Int(POOL_SIZE, help='Max number of connections to keep alive')
+
+    # whether `session` was created by, and hence should be closed by, the proxy
+    _owns_session = False
+
+    @default('session')
+    def _default_session(self):
+        self._owns_session = True
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        return aiohttp.ClientSession(connector=connector)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the HTTP session, unless it was passed in by the caller."""
+        if self._owns_session:
+            await self.session.close()
+
+    def _headers(self):
+        credentials = '{}:{}'.format(*self.auth).encode('latin1')
+        return {'Authorization':
+                'Basic ' + base64.b64encode(credentials).decode('ascii')}
+
+    async def search(self, jql, start_at=0, max_results=500):
+        """
+        Returns the list of parsed iTrack issues and the total number of issues
+        retrieved from iTrack REST API.
+
+        Parameters
+        ----------
+        jql : unicode
+            JQL query string -- this will be URL encoded
+        start_at : int
+            Index of first record to return.
+        max_results : int
+            Max number of results to return.
+        """
+
+        _logger.debug('search() jql=%s, start_at=%d, max_results=%d',
+                      jql, start_at, max_results)
+
+        url = search_url(self, jql, start_at, max_results)
+
+        try:
+            _logger.debug('GET: %s', url)
+            async with self.session.get(url, headers=self._headers()) as res:
+                code = res.status
+                if code == 200:
+                    obj = await res.json(content_type=None, loads=loads)
+                    return parse_search_result(obj, self.fields)
+                elif code == 500:
+                    err = await res.json(content_type=None, loads=loads)
+                    _logger.error('JQL search failed, error = %s', err)
+                else:
+                    _logger.error('JQL search failed, code = %d', code)
+
+        except aiohttp.ClientConnectionError:
+            _logger.error('Failed to connect to iTrack API server')
+
+        return [], 0
+
+
+async def async_search(jql, auth=None, server=None, concurrency=4,
+                       frames=False, session=None, scheme='https', fields=()):
+    """
+    Yields the data retrieved from iTrack REST API as it arrives.
+
+    The first page is fetched on its own to learn the `total` and the page size
+    the server applies, the remaining pages are then fetched by `concurrency`
+    tasks on the running event loop. At most `concurrency` fetched pages are
+    buffered, so the tasks wait when the consumer falls behind. Pages are
+    yielded in order of arrival, not in order of `startAt`.
+
+    Parameters
+    ----------
+    jql : unicode
+        JQL query string -- this will be URL encoded
+    auth : Auth tuple
+        Auth tuple to enable Basic/Digest/Custom HTTP Auth.
+    server : TCPAddress
+        TCPAddress tuple to define API ReST server.
+    concurrency : int
+        Max number of pages to fetch concurrently.
+    frames : bool
+        Whether to yield a DataFrame per page, like `search` returns, instead
+        of the parsed issues.
+    session : aiohttp.ClientSession
+        HTTP session to reuse, a new one is created (and closed) when not given.
+    scheme : unicode
+        URL scheme of the ReST API server.
+    fields : list
+        Names of additional fields to request, next to those in `CONVERTERS`.
+    """
+
+    def _page(items):
+        return [to_frame(items)] if frames else items
+
+    # Initialize iTrack proxy
+    kws = dict(session=session) if session is not None else {}
+    proxy = AsyncITrackProxy(auth=auth, server=server, scheme=scheme,
+                             fields=list(fields),
+                             pool_size=max(concurrency, POOL_SIZE), **kws)
+
+    async with proxy:
+        items, total = await proxy.search(jql)
+        for item in _page(items):
+            yield item
+
+        size = len(items)
+        if size == 0:
+            return
+
+        offsets = iter(range(size, total, size))
+        pending = len(range(size, total, size))
+        queue = asyncio.Queue(maxsize=concurrency)
+
+        async def _worker():
+            try:
+                for start_at in offsets:
+                    items, _ = await proxy.search(jql, start_at=start_at,
+                                                  max_results=size)
+                    await queue.put(items)
+            except Exception as exc:
+                await queue.put(exc)
+
+        workers = [asyncio.ensure_future(_worker())
+                   for _ in range(min(concurrency, pending))]
+        try:
+            for _ in range(pending):
+                items = await queue.get()
+                if isinstance(items, Exception):
+                    raise items
+                for item in _page(items):
+                    yield item
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
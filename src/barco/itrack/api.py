@@ -1,19 +1,232 @@
 """Provides API functions to load data from iTrack REST API."""
-import json
-from pkg_resources import resource_stream
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from .proxy import ITrackProxy
+import pandas as pd
+
+from .config import load_config
+from .parser import DATE_FORMAT, concat_pages, page_length, slice_page
+from .proxy import ITrackProxy, POOL_SIZE, parse_page
 from ..utils.pandas import to_dataframe, set_index, rename, to_datetime
 
 # Load configuration file
-_CONFIG = json.load(resource_stream(__name__, 'config.json'))
+_CONFIG = load_config()
+
+
+def _categorical(values, categories, fixed=False):
+    observed = set(values.dropna().unique())
+    extra = sorted(observed.difference(categories))
+    if fixed and extra:
+        raise ValueError('values of column {!r} without a category: {!r}'
+                         .format(values.name, extra))
+    return pd.CategoricalDtype(list(categories) + extra)
+
+
+def apply_schema(data, schema=None, fixed=False, categories=None):
+    """
+    Returns `data` with the column dtypes of output `schema`.
+
+    The 'compact' schema stores the columns repeating a few distinct strings as
+    categoricals, ordered as listed in `config.json` and `categories`,
+    followed by the other values found in `data` in sorted order, the flag
+    columns as nullable booleans and the business day counts as small
+    integers.
+
+    The categories found in `data` differ between parts of a result, which
+    then concatenate into object columns. With `fixed` categories, only the
+    columns with listed categories are categoricals, with just those, so the
+    dtypes are the same for any part, and a value that isn't listed raises a
+    `ValueError` rather than being lost.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        DataFrame as returned by `search`
+    schema : unicode
+        Name of the schema in `config.json`, `None` to return `data` as-is.
+    fixed : bool
+        Whether to only use the listed categories.
+    categories : dict
+        Mapping of column names to categories to list after those in
+        `config.json`, e.g. the projects of a query.
+    """
+    if schema is None or data.empty:
+        return data
+
+    spec = _CONFIG['schemas'][schema]
+    listed = dict(spec['categories'])
+    for column, values in (categories or {}).items():
+        listed[column] = list(dict.fromkeys(
+            list(listed.get(column, [])) + list(values)))
+    dtypes = {column: _categorical(data[column], values, fixed)
+              for column, values in listed.items()
+              if column in data and (values or not fixed)}
+    dtypes.update((column, dtype) for column, dtype in spec['dtypes'].items()
+                  if column in data)
+    return data.astype(dtypes)
+
+
+def with_schema(func):
+    """Adds a `schema` keyword argument to `func`, see `apply_schema`."""
+
+    @functools.wraps(func)
+    def _wrapper(*args, schema=None, **kwargs):
+        return apply_schema(func(*args, **kwargs), schema)
+    return _wrapper
+
+
+@to_datetime(_CONFIG['date_columns'], format=DATE_FORMAT, errors='coerce')
+@rename(columns=_CONFIG['columns'])
+@set_index('key')
+@to_dataframe
+def to_frame(issues):
+    """
+    Returns a DataFrame of parsed iTrack `issues`, typed, indexed and renamed
+    the same way as the result of `search`.
+
+    Parameters
+    ----------
+    issues : list or dict
+        List of parsed iTrack issue mappings, or a columns mapping.
+    """
+    return issues
+
+
+def _bounded_map(executor, func, iterable, depth):
+    """
+    Yields the results of `func` applied to the items of `iterable` in
+    `executor`, in order, like `executor.map`. Only `depth` items are
+    submitted ahead of the result being consumed, so results wait to be
+    consumed in memory for no more than `depth` items at a time.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+    func : callable
+    iterable : iterable
+    depth : int
+        Max number of items submitted ahead.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _pages(proxy, jql, workers=None):
+    """
+    Yields the pages of parsed issues matching `jql`, in order.
+
+    The first page is always fetched on its own to learn the `total` and the
+    page size the server applies. When `workers` is given, the remaining
+    `startAt` offsets are then fetched concurrently using a pool of at most
+    `workers` threads, as the pages are consumed, otherwise they're fetched
+    one at a time.
+
+    Parameters
+    ----------
+    proxy : ITrackProxy
+        Proxy used to query the iTrack REST API.
+    jql : unicode
+        JQL query string
+    workers : int
+        Max number of pages to fetch concurrently.
+    """
+    items, total = proxy.search(jql)
+    yield items
+
+    retrieved = size = page_length(items)
+    if not workers or size == 0:
+        while 0 < retrieved < total:
+            items, total = proxy.search(jql, start_at=retrieved)
+            if not page_length(items):
+                break
+            retrieved += page_length(items)
+            yield items
+        return
+
+    def _search(start_at):
+        return proxy.search(jql, start_at=start_at, max_results=size)[0]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from _bounded_map(executor, _search, range(size, total, size),
+                                workers)
+
+
+def _parsed_pages(proxy, jql, workers=None, processes=None):
+    """
+    Yields the pages of parsed issues matching `jql`, in order, fetching the
+    raw pages in threads and parsing them in a pool of `processes`.
+
+    Each thread hands its raw page to the process pool as soon as it's
+    received, so parsing overlaps with the requests still in flight. Pages are
+    only requested as far ahead as there are threads and processes to fetch
+    and parse them.
+
+    Parameters
+    ----------
+    proxy : ITrackProxy
+        Proxy used to query the iTrack REST API.
+    jql : unicode
+        JQL query string
+    workers : int
+        Max number of pages to fetch concurrently, one at a time when not given.
+    processes : int
+        Number of processes to parse the pages with.
+    """
+    extra, columnar = list(proxy.fields), proxy.columnar
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        content = proxy.fetch(jql)
+        items, total = pool.submit(parse_page, content, extra, columnar).result()
+        yield items
+
+        size = page_length(items)
+        if size == 0:
+            return
+
+        def _fetch(start_at):
+            content = proxy.fetch(jql, start_at=start_at, max_results=size)
+            return pool.submit(parse_page, content, extra, columnar)
 
+        with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+            for future in _bounded_map(executor, _fetch,
+                                       range(size, total, size),
+                                       (workers or 1) + (processes or 1)):
+                yield future.result()[0]
 
-@to_datetime(_CONFIG['date_columns'])
+
+def _search_pages(jql, auth=None, server=None, workers=None, session=None,
+                  fields=(), cache=None, stream=False, scheme='https',
+                  processes=None, strict=False):
+    """Yields the columns mappings of the pages matching `jql`, see `search`."""
+
+    # Initialize iTrack proxy
+    kws = dict(session=session) if session is not None else {}
+    proxy = ITrackProxy(auth=auth, server=server, scheme=scheme,
+                        fields=list(fields), columnar=True,
+                        cache=cache, stream=stream, strict=strict,
+                        pool_size=max(workers or 0, POOL_SIZE), **kws)
+
+    with proxy:
+        if processes:
+            yield from _parsed_pages(proxy, jql, workers, processes)
+        else:
+            yield from _pages(proxy, jql, workers=workers)
+
+
+@with_schema
+@to_datetime(_CONFIG['date_columns'], format=DATE_FORMAT, errors='coerce')
 @rename(columns=_CONFIG['columns'])
 @set_index('key')
 @to_dataframe
-def search(jql, auth=None, server=None):
+def search(jql, auth=None, server=None, workers=None, session=None, fields=(),
+           cache=None, stream=False, scheme='https', processes=None,
+           strict=False):
     """
     Returns a list with the data retrieved from iTrack REST API.
 
@@ -25,15 +238,71 @@ def search(jql, auth=None, server=None):
         Auth tuple to enable Basic/Digest/Custom HTTP Auth.
     server : TCPAddress
         TCPAddress tuple to define API ReST server.
+    workers : int
+        Max number of pages to fetch concurrently, pages are fetched one at a
+        time when not given.
+    session : requests.Session
+        HTTP session to reuse, a new one is created (and closed) when not given.
+    fields : list
+        Names of additional fields to request, next to those in `CONVERTERS`.
+    cache : barco.utils.cache.DiskCache
+        Cache of the raw search results, to avoid refetching identical pages.
+    stream : bool
+        Whether to decode and parse the issues of a page while it's received.
+    scheme : unicode
+        URL scheme of the ReST API server.
+    processes : int
+        Number of processes to decode and parse the pages with, in place of
+        `stream`, pages are parsed in the calling thread when not given.
+    strict : bool
+        Whether to raise when a request fails, instead of returning the issues
+        retrieved by the other requests.
+    schema : unicode
+        Name of the output schema, e.g. 'compact', see `apply_schema`.
     """
-    retrieved = 0
-    total = 1 # needs to be bigger than retrieved...
-
-    # Initialize iTrack proxy
-    proxy = ITrackProxy(auth=auth, server=server)
 
     # Search issues until all are retrieved
-    while retrieved < total:
-        items, total = proxy.search(jql, start_at=retrieved)
-        retrieved += len(items)
-        yield from iter(items)
+    return concat_pages(_search_pages(
+        jql, auth=auth, server=server, workers=workers, session=session,
+        fields=fields, cache=cache, stream=stream, scheme=scheme,
+        processes=processes, strict=strict
+    ))
+
+
+def search_chunks(jql, chunksize=None, schema=None, categories=None, **kws):
+    """
+    Yields DataFrames with the data retrieved from iTrack REST API, one per
+    page or per `chunksize` rows, each typed, indexed and renamed the same way
+    as the result of `search`. Only one chunk, and the pages fetched ahead by
+    the `workers`, are held in memory at a time.
+
+    The chunks use the `fixed` categories of `schema`, listed in `config.json`
+    and `categories`, so they share their dtypes and concatenate into
+    categoricals, see `apply_schema`. A value without a category raises a
+    `ValueError`, list it in `categories` to keep it.
+
+    Parameters
+    ----------
+    jql : unicode
+        JQL query string -- this will be URL encoded
+    chunksize : int
+        Number of rows per DataFrame, the server's page size when not given.
+    schema : unicode
+        Name of the output schema, e.g. 'compact', see `apply_schema`.
+    categories : dict
+        Mapping of column names to additional categories of `schema`.
+    kws : dict
+        Keyword arguments as taken by `search`.
+    """
+    typed = functools.partial(apply_schema, schema=schema, fixed=True,
+                              categories=categories)
+    chunk = {}
+    for page in _search_pages(jql, **kws):
+        chunk = concat_pages([chunk, page])
+        size = chunksize or page_length(chunk)
+        while size and page_length(chunk) >= size:
+            yield typed(to_frame(slice_page(chunk, stop=size)))
+            chunk = slice_page(chunk, start=size)
+
+    if page_length(chunk):
+        yield typed(to_frame(chunk))
@@ -0,0 +1,194 @@
+"""Provides batch rendering of iTrack reports per partition"""
+import io
+import os
+import re
+import json
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import reporting
+from .reporting import LAST_YEAR, calculate_trend, plot
+
+# Output formats of the rendered reports
+FORMATS = ('png', 'svg', 'pdf')
+
+# Logger instance
+_logger = logging.getLogger(__name__)
+
+
+def _filename(name):
+    return re.sub(r'[^\w.-]+', '_', str(name)).strip('_') or 'report'
+
+
+def partition(active, hist, by='PQM', start=LAST_YEAR):
+    """
+    Yields the (name, active, trend) triples of the partitions of `active` and
+    `hist` by column `by`, in order of name. A partition found in only one of
+    them, e.g. a new project, has an empty active or trend frame.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    hist -- pandas.DataFrame
+        DataFrame with the measures, see `reporting.add_measures`
+    by -- unicode
+        Column to partition by, e.g. 'PQM', 'Experience' or 'project'
+    start -- datetime.date
+        First day of the trends
+    """
+    active_groups = active.groupby(by, observed=True).indices
+    hist_groups = hist.groupby(by, observed=True).indices
+    empty = []
+    for name in sorted(set(active_groups) | set(hist_groups), key=str):
+        yield (name, active.iloc[active_groups.get(name, empty)],
+               calculate_trend(hist.iloc[hist_groups.get(name, empty)], start))
+
+
+def _init_worker():
+    # workers only render to files, on the non-interactive backend
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def report_key(active, trend, options):
+    """
+    Returns a content hash of `active`, `trend`, the plot `options` and the
+    `reporting.TODAY` the plots mask the recent days with, which identifies
+    the rendered report.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    trend -- pandas.DataFrame
+    options -- dict
+        Plot options, see `reporting.plot`
+    """
+    digest = hashlib.sha1()
+    for data in (active, trend):
+        digest.update(repr([(str(k), str(v)) for k, v in data.dtypes.items()])
+                      .encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data).values.tobytes())
+    digest.update(json.dumps(dict(options, _today=reporting.TODAY),
+                             sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_bytes(active, trend, options, formats=('png', )):
+    """
+    Returns a mapping of the `formats` to the rendered report of `active` and
+    `trend`.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    trend -- pandas.DataFrame
+    options -- dict
+        Plot options, see `reporting.plot`
+    formats -- tuple
+        Output formats, any of `FORMATS`
+    """
+    fig = plot(active, trend, options)
+    result = {}
+    for fmt in formats:
+        with io.BytesIO() as fp:
+            fig.savefig(fp, format=fmt)
+            result[fmt] = fp.getvalue()
+    return result
+
+
+def _write(path, rendered):
+    filenames = []
+    for fmt, content in rendered.items():
+        filename = '{}.{}'.format(path, fmt)
+        with open(filename, 'wb') as fp:
+            fp.write(content)
+        filenames.append(filename)
+    return filenames
+
+
+def render(active, trend, options, path, formats=('png', )):
+    """
+    Renders the report of `active` and `trend` to `path` with the extension
+    of each of the `formats`, and returns the file names.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    trend -- pandas.DataFrame
+    options -- dict
+        Plot options, see `reporting.plot`
+    path -- unicode
+        File name without extension
+    formats -- tuple
+        Output formats, any of `FORMATS`
+    """
+    return _write(path, render_bytes(active, trend, options, formats))
+
+
+def render_reports(active, hist, by='PQM', directory='.', formats=('png', ),
+                   start=LAST_YEAR, processes=None, cache=None):
+    """
+    Renders the report of every partition of `active` and `hist` by column
+    `by` in a pool of `processes`, and returns a mapping of the partition
+    names to the file names.
+
+    The reports are named after their partitions, and are saved in
+    `directory`. With a `cache`, the rendered reports are stored by their
+    `report_key`, and only partitions of which the data changed are rendered
+    again.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    hist -- pandas.DataFrame
+        DataFrame with the measures, see `reporting.add_measures`
+    by -- unicode
+        Column to partition by, e.g. 'PQM', 'Experience' or 'project'
+    directory -- unicode
+        Directory to save the reports in
+    formats -- tuple
+        Output formats, any of `FORMATS`
+    start -- datetime.date
+        First day of the trends
+    processes -- int
+        Max number of reports to render concurrently
+    cache -- barco.utils.cache.DiskCache
+        Cache of the rendered reports
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError('unsupported formats: {}'.format(sorted(unknown)))
+
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=_init_worker) as pool:
+        reports = {}
+        for name, data, trend in partition(active, hist, by, start):
+            options = dict(name='{}: {}'.format(by, name))
+            path = os.path.join(directory, _filename(name))
+            key = None if cache is None else report_key(data, trend, options)
+            rendered = {}
+            if cache is not None:
+                rendered = {fmt: cache.get('{}.{}'.format(key, fmt))
+                            for fmt in formats}
+                rendered = {k: v for k, v in rendered.items() if v is not None}
+            missing = [fmt for fmt in formats if fmt not in rendered]
+            _logger.debug('render_reports() %s=%s, missing=%s', by, name,
+                          missing)
+            future = (pool.submit(render_bytes, data, trend, options, missing)
+                      if missing else None)
+            reports[name] = (path, key, rendered, future)
+
+        result = {}
+        for name, (path, key, rendered, future) in reports.items():
+            if future is not None:
+                for fmt, content in future.result().items():
+                    if cache is not None:
+                        cache.set('{}.{}'.format(key, fmt), content)
+                    rendered[fmt] = content
+            result[name] = _write(path, {fmt: rendered[fmt]
+                                         for fmt in formats})
+        return result
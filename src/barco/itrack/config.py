@@ -0,0 +1,11 @@
+"""Provides the configuration of the iTrack functions."""
+import json
+from functools import lru_cache
+from importlib import resources
+
+
+@lru_cache()
+def load_config():
+    """Returns the mapping loaded from `config.json`, read once and cached."""
+    with resources.files(__package__).joinpath('config.json').open('rb') as fp:
+        return json.load(fp)
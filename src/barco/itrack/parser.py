@@ -1,20 +1,25 @@
 """Provides functions to parse data objects returned from iTrack REST API."""
 from datetime import datetime as dt
-from functools import partial, reduce
-import json
+from functools import lru_cache, partial, reduce
 
-from pkg_resources import resource_stream
 import numpy as np
 
-from ..utils.recipes import compose, ident, itemgetter, splitstr, fst
-from ..utils.decorators import join_with, strptime_with
+from .config import load_config
+from ..utils.recipes import (compose, compile_converters,
+                             compile_column_converters, ident, itemgetter,
+                             splitstr, fst)
+from ..utils.decorators import join_with
 
 # Load configuration file
-_CONFIG = json.load(resource_stream(__name__, 'config.json'))
+_CONFIG = load_config()
+
+# format of the dates returned by date converters
+DATE_FORMAT = '%Y-%m-%d'
 
 _CLOSED_STATES = _CONFIG['closed_states']
 _DEFECT_TYPES = _CONFIG['issue_type']['defect']
 _CHANGE_TYPES = _CONFIG['issue_type']['change']
+_HOLIDAYS = tuple(_CONFIG.get('holidays', []))
 
 # Initialize item getters
 _get_name = itemgetter('name')
@@ -29,14 +34,53 @@ def _get_versions(sequence):
     return reduce(_reducer, sequence, []) if isinstance(sequence, list) else []
 
 
-@strptime_with()
 def _get_date(s):
+    # keep the ISO-8601 date, as written by the server, to be converted per
+    # column using `DATE_FORMAT`
     return s.split('T')[0] if isinstance(s, str) else None
 
 
-def _busday(obj, start, end=None, today=dt.today().date()):
-    date = obj.get(end, today) if end in obj else today
-    return np.busday_count(obj[start], date if date else today)
+@lru_cache()
+def busday_calendar(holidays=_HOLIDAYS):
+    """
+    Returns the (cached) business day calendar with the given `holidays`.
+
+    Parameters
+    ----------
+    holidays : tuple
+        ISO-8601 dates that are not business days, next to the weekends.
+    """
+    return np.busdaycalendar(holidays=list(holidays))
+
+
+def busday_count(starts, ends=None, today=None, holidays=_HOLIDAYS):
+    """
+    Returns the number of business days between `starts` and `ends`, counting
+    up to `today` where an end date is missing and zero where a start date is
+    missing.
+
+    Parameters
+    ----------
+    starts, ends : array-like
+        Dates, e.g. ISO-8601 strings or datetime64 values, or `None`.
+    today : datetime.date
+        Date to count up to for missing end dates, defaults to the current date.
+    holidays : tuple
+        ISO-8601 dates that are not business days, next to the weekends.
+    """
+    today = np.datetime64(today or dt.today().date(), 'D')
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    ends = np.asarray(ends, dtype='datetime64[D]')
+    ends = np.where(np.isnat(ends), today, ends)
+    missing = np.isnat(starts)
+    starts = np.where(missing, ends, starts)
+    return np.busday_count(starts, ends, busdaycal=busday_calendar(holidays))
+
+
+def _dates(values):
+    # missing values are NaN in columns, which numpy can't convert to a date
+    return [value if isinstance(value, str) else None for value in values]
+
 
 # field value converters
 CONVERTERS = dict(
@@ -59,14 +103,83 @@ CONVERTERS = dict(
 )
 
 
-def parse_itrack_issue(issue):
-    """Parses iTrack issue mapping."""
+@lru_cache(maxsize=32)
+def _compile(converters):
+    return compile_converters(dict(converters))
+
+
+@lru_cache(maxsize=32)
+def _compile_columns(converters):
+    # missing values are NaN like they are when building a DataFrame from
+    # mappings
+    return compile_column_converters(dict(converters), missing=np.nan)
+
+
+def _converters(extra):
+    return tuple(CONVERTERS.items()) + tuple(
+        (k, ident) for k in dict.fromkeys(extra) if k not in CONVERTERS)
+
+
+def compile_plan(extra=()):
+    """
+    Returns the compiled function converting the fields of a raw iTrack issue
+    using `CONVERTERS`, keeping `extra` fields without a converter as-is. Plans
+    are cached and recompiled when `CONVERTERS` is altered.
+
+    Parameters
+    ----------
+    extra : list
+        Names of additional fields to keep as-is when they have no converter.
+    """
+    return _compile(_converters(extra))
+
+
+def compile_page_plan(extra=()):
+    """
+    Returns the compiled function converting the fields of a page of raw
+    iTrack issues into columns, the same way `compile_plan` converts those of
+    one issue. Plans are cached and recompiled when `CONVERTERS` is altered.
+
+    Parameters
+    ----------
+    extra : list
+        Names of additional fields to keep as-is when they have no converter.
+    """
+    return _compile_columns(_converters(extra))
+
+
+def search_fields(extra=()):
+    """
+    Returns the list of iTrack issue fields to request from the REST API, i.e.
+    the fields having a converter in `CONVERTERS` followed by `extra`.
+
+    Parameters
+    ----------
+    extra : list
+        Names of additional fields to request.
+    """
+    return list(dict.fromkeys(list(CONVERTERS) + list(extra)))
+
+
+def parse_itrack_issue(issue, extra=(), today=None):
+    """
+    Parses iTrack issue mapping.
+
+    Parameters
+    ----------
+    issue : dict
+        Raw iTrack issue mapping.
+    extra : list
+        Names of additional fields to keep as-is when they have no converter.
+    today : datetime.date
+        Date to count the age and idle time up to, defaults to the current date.
+    """
 
     # get 'fields' from `issue`
     fields = issue.get('fields', {})
 
-    # apply converters
-    data = {k: f(fields[k]) for k, f in CONVERTERS.items() if k in fields}
+    # apply converters and add extra fields
+    data = compile_plan(extra)(fields)
 
     # add key
     data['key'] = issue.get('key', None)
@@ -75,7 +188,98 @@ def parse_itrack_issue(issue):
     data['closed'] = data.get('status', None) in _CLOSED_STATES
     data['defect'] = data.get('issuetype', None) in _DEFECT_TYPES
     data['change'] = data.get('issuetype', None) in _CHANGE_TYPES
-    data['age'] = _busday(data, 'created', 'customfield_10350')
-    data['idle'] = _busday(data, 'updated')
+    data['age'] = busday_count(data.get('created'),
+                               data.get('customfield_10350'), today)
+    data['idle'] = busday_count(data.get('updated'), None, today)
 
     return data
+
+
+def parse_itrack_page(issues, extra=(), today=None):
+    """
+    Parses a page of iTrack issue mappings into columns, i.e. a mapping of
+    column names to lists of values. Building a DataFrame from it gives the same
+    result as building one from the `parse_itrack_issue` mappings.
+
+    Parameters
+    ----------
+    issues : iterable
+        Raw iTrack issue mappings, consumed in a single pass.
+    extra : list
+        Names of additional fields to keep as-is when they have no converter.
+    today : datetime.date
+        Date to count the age and idle time up to, defaults to the current date.
+    """
+    keys = []
+    first = []
+
+    def _fields():
+        for issue in issues:
+            fields = issue.get('fields', {})
+            if not keys:
+                first.append(fields)
+            keys.append(issue.get('key', None))
+            yield fields
+
+    # columns in order of first appearance, like building a DataFrame from
+    # mappings orders them
+    columns = compile_page_plan(extra)(_fields())
+    if not keys:
+        return {}
+    # the fields of the first issue lead, its metadata follows them
+    head = [k for k in columns if k in first[0]]
+
+    # add key and metadata
+    missing = [None] * len(keys)
+    status = columns.get('status', missing)
+    issuetype = columns.get('issuetype', missing)
+    derived = dict(
+        key=keys,
+        closed=[v in _CLOSED_STATES for v in status],
+        defect=[v in _DEFECT_TYPES for v in issuetype],
+        change=[v in _CHANGE_TYPES for v in issuetype],
+        age=busday_count(_dates(columns.get('created', missing)),
+                         _dates(columns.get('customfield_10350', missing)),
+                         today).tolist(),
+        idle=busday_count(_dates(columns.get('updated', missing)), missing,
+                          today).tolist(),
+    )
+
+    page = {k: columns[k] for k in head}
+    page.update(derived)
+    page.update((k, v) for k, v in columns.items() if k not in page)
+    return page
+
+
+def page_length(page):
+    """Returns the number of issues in `page`, a list or columns mapping."""
+    return len(page.get('key', ())) if isinstance(page, dict) else len(page)
+
+
+def concat_pages(pages):
+    """
+    Returns the columns mapping concatenating the columns of `pages`, missing
+    columns are filled with NaN.
+
+    Parameters
+    ----------
+    pages : iterable
+        Columns mappings as returned by `parse_itrack_page`.
+    """
+    columns = {}
+    n = 0
+    for page in pages:
+        for k, values in page.items():
+            column = columns.get(k)
+            if column is None:
+                column = columns[k] = [np.nan] * n
+            column.extend(values)
+        n += page_length(page)
+        for column in columns.values():
+            column.extend([np.nan] * (n - len(column)))
+    return columns
+
+
+def slice_page(page, start=None, stop=None):
+    """Returns the columns mapping with rows `start` to `stop` of `page`."""
+    return {k: values[start:stop] for k, values in page.items()}
@@ -2,43 +2,149 @@
 import urllib
 import logging
 import functools
-from collections import Mapping
+from collections.abc import Iterator, Mapping
 
 import requests
-from traitlets import HasTraits, TCPAddress
+from requests.adapters import HTTPAdapter
+from traitlets import (HasTraits, TCPAddress, Bool, Instance, Int, List,
+                       Unicode, default)
 
 from ..types import Auth
-from .parser import parse_itrack_issue
+from ..utils.cache import DiskCache
+from ..utils.jsonstream import loads, iterload
+from .parser import parse_itrack_issue, parse_itrack_page, search_fields
 
 # URL format string for `search` queries
-_SEARCH = 'https://{}:{:d}/rest/api/2/search?jql={}&startAt={:d}&maxResults={:d}'
+_SEARCH = ('{}://{}:{:d}/rest/api/2/search?jql={}&startAt={:d}&maxResults={:d}'
+           '&fields={}')
+
+# Size of the chunks in which streamed responses are read
+CHUNK_SIZE = 64 * 1024
+
+# Default number of pooled keep-alive connections per session
+POOL_SIZE = 10
 
 # Logger instance
 _logger = logging.getLogger(__name__)
 
 
+def create_session(pool_size=POOL_SIZE):
+    """
+    Returns a HTTP session keeping up to `pool_size` connections alive, so
+    subsequent requests reuse them instead of doing a new TLS handshake.
+
+    The session can be shared between `ITrackProxy` instances and threads, use
+    it as a context manager or call `close` to release its connections.
+
+    Parameters
+    ----------
+    pool_size : int
+        Max number of connections to keep alive.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def search_url(proxy, jql, start_at, max_results):
+    """
+    Returns the URL of a `search` query of `proxy`, requesting only the fields
+    that are parsed.
+
+    Parameters
+    ----------
+    proxy : ITrackProxy
+        Proxy defining the server, scheme and extra fields.
+    jql : unicode
+        JQL query string -- this will be URL encoded
+    start_at : int
+        Index of first record to return.
+    max_results : int
+        Max number of results to return.
+    """
+    fields = ','.join(search_fields(proxy.fields))
+    return _SEARCH.format(proxy.scheme, *proxy.server,
+                          urllib.parse.quote_plus(jql), start_at, max_results,
+                          urllib.parse.quote_plus(fields, safe=','))
+
+
+def _iter_issues(members, obj):
+    for name, value in members:
+        if name == 'issues':
+            yield value
+        else:
+            obj[name] = value
+
+
+def parse_search_result(obj, extra=(), columnar=False):
+    """
+    Returns the parsed iTrack issues and the total number of issues from the raw
+    JSON object `obj` returned by a `search` query.
+
+    Parameters
+    ----------
+    obj : dict or iterator
+        A raw JSON object, or an iterator of its `(name, value)` members with
+        the issues yielded one at a time, see `jsonstream.iterload`.
+    extra : list
+        Names of additional fields to keep as-is.
+    columnar : bool
+        Whether to return the issues as a columns mapping, see
+        `parse_itrack_page`, instead of a list of issue mappings.
+    """
+    if isinstance(obj, Iterator):
+        members, obj = obj, {}
+        issues = _iter_issues(members, obj)
+    elif isinstance(obj, Mapping):
+        issues = obj.get('issues', [])
+    else:
+        return ({} if columnar else []), 0
+
+    if columnar:
+        page = parse_itrack_page(issues, extra)
+    else:
+        page = [parse_itrack_issue(issue, extra) for issue in issues]
+
+    return page, int(obj.get('total', 0))
+
+
+def parse_page(content, extra=(), columnar=True):
+    """
+    Returns the parsed iTrack issues and the total number of issues from the
+    raw JSON document `content` returned by `ITrackProxy.fetch`. Being a
+    module level function, it can be run in a process pool.
+
+    Parameters
+    ----------
+    content : bytes
+        A raw JSON document, or `None`.
+    extra : list
+        Names of additional fields to keep as-is.
+    columnar : bool
+        Whether to return the issues as a columns mapping, see
+        `parse_itrack_page`, instead of a list of issue mappings.
+    """
+    obj = loads(content) if content is not None else None
+    return parse_search_result(obj, extra, columnar)
+
+
 def parse_itrack_issues(func):
     """
     Converts the raw JSON object resulting from `func` to a list of iTrack issue
-    mappings.
+    mappings, or to a columns mapping when the proxy is `columnar`.
 
     Parameters
     ----------
     func : function
-        A function that returns a raw JSON object.
+        A proxy method that returns a raw JSON object.
     """
 
     @functools.wraps(func)
-    def _wrapper(*args, **kwargs):
-        obj = func(*args, **kwargs)
-
-        if isinstance(obj, Mapping):
-            issues = [parse_itrack_issue(issue)
-                      for issue in obj.get('issues', [])]
-            total = int(obj.get('total', 0))
-            return issues, total
-
-        return [], 0
+    def _wrapper(self, *args, **kwargs):
+        return parse_search_result(func(self, *args, **kwargs), self.fields,
+                                   self.columnar)
 
     return _wrapper
 
@@ -47,12 +153,113 @@ class ITrackProxy(HasTraits):
     """A proxy to the iTrack ReST API."""
 
     server = TCPAddress(help='TCP address of the ReST API server')
+    scheme = Unicode('https', help='URL scheme of the ReST API server')
     auth = Auth(help='Auth tuple to enable Basic/Digest/Custom HTTP Auth.')
+    fields = List(Unicode(), help='Names of additional fields to request')
+    session = Instance(requests.Session, help='HTTP session to send requests')
+    pool_size = Int(POOL_SIZE, help='Max number of connections to keep alive')
+    cache = Instance(DiskCache, allow_none=True,
+                     help='Cache of the raw search results')
+    stream = Bool(False, help='Whether to decode search results incrementally')
+    columnar = Bool(False, help='Whether to parse search results into columns')
+    strict = Bool(False, help='Whether to raise when a request fails, instead '
+                              'of logging it and returning no results')
+
+    # whether `session` was created by, and hence should be closed by, the proxy
+    _owns_session = False
+
+    @default('session')
+    def _default_session(self):
+        self._owns_session = True
+        return create_session(self.pool_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the HTTP session, unless it was passed in by the caller."""
+        if self._owns_session:
+            self.session.close()
+
+    def _cache_chunks(self, url, chunks):
+        content = []
+        for chunk in chunks:
+            content.append(chunk)
+            yield chunk
+        self.cache.set(url, b''.join(content))
+
+    def _get(self, url, stream=False):
+        """
+        Returns the response to a GET of `url`, or `None` when it failed and
+        the proxy isn't `strict`.
+        """
+        try:
+            _logger.debug('GET: %s', url)
+            res = self.session.get(url, auth=self.auth, stream=stream)
+
+        except requests.exceptions.ConnectionError:
+            _logger.error('Failed to connect to iTrack API server')
+            if self.strict:
+                raise
+        else:
+            code = res.status_code
+            if code == 200:
+                return res
+            elif code == 500:
+                err = res.json()
+                _logger.error('JQL search failed, error = %s', err, exc_info=1)
+            else:
+                _logger.error('JQL search failed, code = %d', code, exc_info=1)
+            if self.strict:
+                res.raise_for_status()
+
+        return None
+
+    def _cached(self, url):
+        content = self.cache.get(url) if self.cache is not None else None
+        if content is not None:
+            _logger.debug('CACHED: %s', url)
+        return content
+
+    def fetch(self, jql, start_at=0, max_results=500):
+        """
+        Returns the raw JSON document retrieved from iTrack REST API as bytes,
+        or `None` when the request failed. See `parse_page` to parse it, e.g.
+        in another process.
+
+        Parameters
+        ----------
+        jql : unicode
+            JQL query string -- this will be URL encoded
+        start_at : int
+            Index of first record to return.
+        max_results : int
+            Max number of results to return.
+        """
+
+        _logger.debug('fetch() jql=%s, start_at=%d, max_results=%d',
+                      jql, start_at, max_results)
+
+        url = search_url(self, jql, start_at, max_results)
+
+        content = self._cached(url)
+        if content is None:
+            res = self._get(url)
+            if res is not None:
+                content = res.content
+                if self.cache is not None:
+                    self.cache.set(url, content)
+        return content
 
     @parse_itrack_issues
     def search(self, jql, start_at=0, max_results=500):
         """
-        Returns a JSON object with data retrieved from iTrack REST API.
+        Returns a JSON object with data retrieved from iTrack REST API, or an
+        iterator of its members decoding the response incrementally when
+        `stream` is set.
 
         Parameters
         ----------
@@ -64,26 +271,24 @@ class ITrackProxy(HasTraits):
             Max number of results to return.
         """
 
+        if not self.stream:
+            content = self.fetch(jql, start_at, max_results)
+            return loads(content) if content is not None else {}
+
         _logger.debug('search() jql=%s, start_at=%d, max_results=%d',
                       jql, start_at, max_results)
 
-        url = _SEARCH.format(*self.server, urllib.parse.quote_plus(jql),
-                             start_at, max_results)
+        url = search_url(self, jql, start_at, max_results)
 
-        try:
-            _logger.debug('GET: %s', url)
-            res = requests.get(url, auth=self.auth)
+        content = self._cached(url)
+        if content is not None:
+            return loads(content)
 
-        except requests.exceptions.ConnectionError:
-            _logger.error('Failed to connect to iTrack API server')
-        else:
-            code = res.status_code
-            if code == 200:
-                return res.json()
-            elif code == 500:
-                err = res.json()
-                _logger.error('JQL search failed, error = %s', err, exc_info=1)
-            else:
-                _logger.error('JQL search failed, code = %d', code, exc_info=1)
+        res = self._get(url, stream=True)
+        if res is not None:
+            chunks = res.iter_content(CHUNK_SIZE)
+            if self.cache is not None:
+                chunks = self._cache_chunks(url, chunks)
+            return iterload(chunks, 'issues')
 
         return {}
@@ -5,25 +5,58 @@ from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
 from pandas.tseries.offsets import BDay
-import matplotlib.pyplot as plt
-import seaborn as sns
+from traitlets import HasTraits, Any, Dict, Instance, Int
 
-from . import api
-from ..utils.recipes import const, bool2int
+from . import api, trend
+from .proxy import create_session, POOL_SIZE
 from ..auth import BasicAuth
 
-sns.set(style='white')
-sns.set_palette(sns.color_palette("Paired"))
-
-AUTH = BasicAuth.from_env('ITRACK')
 SERVER = ('itrack.barco.com', 443)
 TODAY = datetime.today().date()
 LAST_YEAR = TODAY - timedelta(days=356)
-BLUE, DARK_BLUE, GREEN, DARK_GREEN, RED, DARK_RED = sns.color_palette()
+COLORS = ('BLUE', 'DARK_BLUE', 'GREEN', 'DARK_GREEN', 'RED', 'DARK_RED')
+# service level agreement measures, (start, end, n) meaning `end` should be at
+# most `n` business days after `start`
+SLAS = dict(
+    FRT_10=('created', 'investigated', 10),
+    TRT_20=('created', 'closuredate', 20)
+)
+# JQL format string of the history, i.e. issues created or closed since a date
+HIST_JQL = ('filter=26769 and '
+            '(created > {0:%Y-%m-%d} or closed > {0:%Y-%m-%d})')
 MARKERS = ['D', '*', 'o', 'v', '^', '<', '>', '1', '2', '3', '4', 's', 'p',
            ',', 'h', 'H', '+', 'x', '.', 'd']
 
 
+@functools.lru_cache()
+def _seaborn():
+    # the plotting stack is only imported, and styled, when plotting
+    import seaborn as sns
+    sns.set(style='white')
+    sns.set_palette(sns.color_palette("Paired"))
+    return sns
+
+
+@functools.lru_cache()
+def _palette():
+    return dict(zip(COLORS, _seaborn().color_palette()))
+
+
+@functools.lru_cache()
+def _auth():
+    return BasicAuth.from_env('ITRACK')
+
+
+def __getattr__(name):
+    """Resolves `AUTH` and the `COLORS` on first use."""
+    if name == 'AUTH':
+        return _auth()
+    if name in COLORS:
+        return _palette()[name]
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
 def add_metadata(data, config, pqm=True, experience=True):
     """
     Adds PQM and Experience metadata to `data`.
@@ -46,57 +79,235 @@ def add_metadata(data, config, pqm=True, experience=True):
     return df
 
 
-def add_measures(data):
+def sla_measure(data, start, end, n, today=TODAY, nullable=False):
     """
-    Adds the measures columns to `data`.
+    Returns an array flagging with 1 the rows of `data` where date column `end`
+    is at most `n` business days after date column `start`, and with 0 the
+    others. Missing dates count as `today`. The flag is missing where `start`
+    lies within the last `n` business days, as the measure makes no sense yet.
 
     Parameters
     ----------
     data -- pandas.DataFrame
+    start, end -- unicode
+        Names of the date columns
+    n -- int
+        Number of business days
+    today -- datetime.date
+    nullable -- bool
+        Whether to return a nullable `Int8` array, instead of an integer array
+        which is converted to float when there are missing flags
     """
+    today = np.datetime64(today, 'D')
+
+    def _days(column):
+        return np.asarray(data[column], dtype='datetime64[D]')
 
-    def _busday(start, end, n=1):
-        def _inner(df):
-            return ((df[start].fillna(TODAY) + BDay(n) >= df[end].fillna(TODAY))
-                    .map(bool2int))
-        return _inner
+    def _fill(days):
+        return np.where(np.isnat(days), today, days)
 
-    measures = ('N', 'FRT_10', 'TRT_20')
-    funcs = (const(1), _busday('created', 'investigated', n=10),
-             _busday('created', 'closuredate', n=20))
+    starts = _days(start)
+    met = (np.busday_offset(_fill(starts), n, roll='backward') >=
+           _fill(_days(end))).astype(np.int64)
+    recent = starts >= np.busday_offset(today, -n, roll='forward')
 
-    df = data.copy().assign(
-        **{k: func for k, func in zip(measures, funcs)}
+    if nullable:
+        return pd.arrays.IntegerArray(met.astype(np.int8), recent)
+    return np.where(recent, np.nan, met) if recent.any() else met
+
+
+def add_measures(data, slas=None, today=TODAY, nullable=False):
+    """
+    Adds the measures columns to `data`, i.e. `N` and the service level
+    agreement measures, see `sla_measure`.
+
+    Parameters
+    ----------
+    data -- pandas.DataFrame
+    slas -- dict
+        Mapping of measure names to (start, end, n) tuples, defaults to `SLAS`
+    today -- datetime.date
+    nullable -- bool
+        Whether to add the service level agreement measures as nullable `Int8`
+        columns
+    """
+    measures = dict(N=np.ones(len(data), dtype=np.int64))
+    measures.update(
+        (name, sla_measure(data, *sla, today=today, nullable=nullable))
+        for name, sla in (SLAS if slas is None else slas).items()
     )
 
-    # these measures make no sense for the recent dates --> clear these
-    for measure, n in zip(measures[1:], (10, 20)):
-        df.loc[df.created >= TODAY - BDay(n), measure] = np.nan
+    if data.columns.isin(list(measures)).any():
+        return data.assign(**measures)
 
-    return df
+    # join the measures without copying `data`
+    return pd.concat([data, pd.DataFrame(measures, index=data.index)], axis=1,
+                     copy=False)
 
 
-def calculate_trend(data, start=LAST_YEAR):
+def calculate_trend(data, start=LAST_YEAR, window=trend.WINDOW):
     """
-    Calculates trend measures for `data`.
+    Calculates trend measures for `data`, see `trend.calculate`.
 
     Parameters
     ----------
     data -- pandas.DataFrame
+    start -- datetime.date
+        First day of the trend
+    window -- int
+        Number of business days of the rolling means
     """
-    def _timeseries(data, x='created', y='N', agg='sum', freq='B'):
-        return (data.rename(columns={x:'DT'}).set_index('DT').sort_index()
-                .resample(freq)[y].agg(agg).fillna(0))
+    return trend.calculate(data, start, window=window)
 
-    return pd.DataFrame(dict(
-        created=_timeseries(data),
-        resolved=_timeseries(data, x='closuredate'),
-        FRT_10=_timeseries(data, y='FRT_10', agg='mean'),
-        TRT_20=_timeseries(data, y='TRT_20', agg='mean')
-    ))[start:]
 
+class Report(HasTraits):
+    """
+    The hist aspect of the iTrack report, i.e. the issues with their metadata
+    and measures, and their trend, which can be updated incrementally.
 
-def load(config, start=LAST_YEAR):
+    An update only adds the metadata and measures of the changed issues, and
+    replaces their contributions to the trend bins. Unchanged issues are only
+    remeasured when `today` moves on, and only those of which the measures
+    depend on it, i.e. with a missing or recent date.
+    """
+
+    pqms = Dict(help='Mapping of projects to PQMs')
+    start = Any(LAST_YEAR, help='First day of the trend')
+    today = Any(TODAY, help='Date the measures are computed against')
+    window = Int(trend.WINDOW,
+                 help='Number of business days of the rolling means')
+    hist = Instance(pd.DataFrame, allow_none=True,
+                    help='The issues with their metadata and measures')
+    bins = Instance(trend.Bins, allow_none=True,
+                    help='The per business day contributions of the issues')
+    trend = Instance(pd.DataFrame, allow_none=True,
+                     help='The trend frame, see `calculate_trend`')
+
+    def _volatile(self, today):
+        # returns the issues of which the measures changed with `today`
+        hist = self.hist
+        mask = np.zeros(len(hist), dtype=bool)
+        for start, end, n in SLAS.values():
+            recent = np.busday_offset(np.datetime64(self.today, 'D'), -n,
+                                      roll='forward')
+            mask |= (hist[start].isna() | hist[end].isna() |
+                     (hist[start] >= recent)).values
+        old = hist[mask]
+        new = add_measures(old, today=today)
+        columns = list(SLAS)
+        changed = (new[columns].fillna(-1) != old[columns].fillna(-1)).any(axis=1)
+        return new[changed.values]
+
+    def _trend(self):
+        self.trend = trend.trend_frame(self.bins, start=self.start,
+                                       window=self.window)
+        return self
+
+    def build(self, hist, today=None):
+        """
+        Computes the report of all issues in `hist` from scratch.
+
+        Parameters
+        ----------
+        hist -- pandas.DataFrame
+            DataFrame as returned by `api.search`
+        today -- datetime.date
+            Date to compute the measures against, defaults to `today`
+        """
+        if today is not None:
+            self.today = today
+        self.hist = hist.pipe(add_metadata, self.pqms).pipe(
+            add_measures, today=self.today)
+        self.bins = trend.bin_trends(self.hist)
+        return self._trend()
+
+    def update(self, delta, today=None):
+        """
+        Updates the report with the changed and new issues in `delta`.
+
+        Parameters
+        ----------
+        delta -- pandas.DataFrame
+            DataFrame as returned by `api.search`
+        today -- datetime.date
+            Date to compute the measures against, defaults to `today`
+        """
+        if self.hist is None:
+            return self.build(delta, today)
+
+        today = self.today if today is None else today
+        # an empty delta, e.g. without any changed issues, has no columns
+        rows = None if delta.empty else delta.pipe(
+            add_metadata, self.pqms).pipe(add_measures, today=today)
+        if today != self.today:
+            volatile = self._volatile(today)
+            rows = volatile if rows is None else pd.concat(
+                [rows, volatile[~volatile.index.isin(rows.index)]])
+        if rows is None:
+            return self
+
+        replaced = self.hist.index.isin(rows.index)
+        self.bins.add(self.hist[replaced], sign=-1).add(rows)
+        self.hist = pd.concat([self.hist[~replaced], rows])
+        self.today = today
+        return self._trend()
+
+    def sync(self, store, full=False, **kws):
+        """
+        Syncs the history in `store` with iTrack, and updates the report with
+        the fetched issues, see `sync_hist`.
+
+        Parameters
+        ----------
+        store -- barco.itrack.store.IssueStore
+        full -- bool
+            Whether to fetch all issues, and rebuild the report
+        kws -- dict
+            Keyword arguments passed to `api.search`
+        """
+        today = datetime.today().date()
+        data, delta = sync_hist(store, self.start, full=full, **kws)
+        if full or self.hist is None:
+            return self.build(data, today)
+        return self.update(delta, today)
+
+
+def _since(data, start):
+    # the issues of `data` created or closed since `start`, like `HIST_JQL`,
+    # of which the dates are whole days
+    if data.empty:
+        return data
+    start = pd.Timestamp(start)
+    return data[(data.created >= start) | (data.closuredate >= start)]
+
+
+def sync_hist(store, start=LAST_YEAR, full=False, **kws):
+    """
+    Returns the history since `start`, and the issues fetched to update it,
+    after syncing it in `store`, see `IssueStore.sync`.
+
+    The store holds the history since the first day of the month of `start`,
+    so its query only changes, and all issues are fetched again, once a month
+    as `start` moves on. The issues which left the history in between are
+    dropped from the returned DataFrames.
+
+    Parameters
+    ----------
+    store -- barco.itrack.store.IssueStore
+    start -- datetime.date
+        First day of the history
+    full -- bool
+        Whether to fetch all issues, regardless of a previous sync
+    kws -- dict
+        Keyword arguments passed to `api.search`
+    """
+    jql = HIST_JQL.format(start.replace(day=1))
+    data, delta = store.sync('hist', jql, full=full, with_delta=True, **kws)
+    return _since(data, start), _since(delta, start)
+
+
+def load(config, start=LAST_YEAR, workers=None, store=None, cache=None,
+         schema=None):
     """
     Returns the active and hist aspect of the iTrack report.
 
@@ -104,23 +315,46 @@ def load(config, start=LAST_YEAR):
     ----------
     config -- dict
         Mapping with a 'pqms' key with the project to PQM mapping
+    workers -- int
+        Max number of pages to fetch concurrently per query
+    store -- barco.itrack.store.IssueStore
+        Local issue store to sync the history with incrementally, instead of
+        fetching all of it
+    cache -- barco.utils.cache.DiskCache
+        Cache of the raw search results, to avoid refetching identical pages,
+        which isn't used to sync the history in `store`
+    schema -- unicode
+        Name of the output schema of the loaded data, see `api.apply_schema`
     """
 
-    # load the history
-    JQL = 'filter=26769 and (created > {0:%Y-%m-%d} or closed > {0:%Y-%m-%d})'
-    jql = JQL.format(start)
-    hist = api.search(
-        jql, auth=AUTH, server=SERVER
-    ).pipe(add_metadata, config['pqms']).pipe(add_measures)
-
-    # load the active
-    active = api.search(
-        'filter=27347', auth=AUTH, server=SERVER
-    ).pipe(add_metadata, config['pqms'])
+    with create_session(max(workers or 0, POOL_SIZE)) as session:
+        kws = dict(auth=_auth(), server=SERVER, workers=workers, session=session,
+                   cache=cache)
+
+        # load the history
+        hist = (api.search(HIST_JQL.format(start), **kws) if store is None else
+                sync_hist(store, start, **dict(kws, cache=None))[0])
+        hist = hist.pipe(api.apply_schema, schema).pipe(
+            add_metadata, config['pqms']
+        ).pipe(add_measures)
+
+        # load the active -- issues leave this filter when resolved, so it
+        # can't be synced incrementally
+        active = api.search('filter=27347', schema=schema, **kws).pipe(
+            add_metadata, config['pqms']
+        )
 
     return active, hist
 
 
+def _rolling(data, column):
+    # trend frames of `calculate_trend` hold the rolling means already
+    rolling = column + trend.ROLLING
+    if rolling in data:
+        return data[rolling]
+    return data[column].rolling(trend.WINDOW).mean()
+
+
 def pyplot(title=None, xlabel=None, ylabel=None, legend=True):
     """
     Decorator factory adding formatting matplotlib Axes returned from decorated
@@ -149,7 +383,7 @@ def pyplot(title=None, xlabel=None, ylabel=None, legend=True):
                 ax.set_ylabel(ylabel)
             if legend:
                 ax.legend(loc='best', fancybox=True, framealpha=0.5)
-            sns.despine(ax=ax)
+            _seaborn().despine(ax=ax)
             return ax
         return _wrapper
     return _decorator
@@ -168,7 +402,7 @@ def age_vs_idle_scatter(data, ax):
     data -- pandas.DataFrame
     ax -- matplotlib.axes.Axes
     """
-    groups = data.groupby('status')
+    groups = data.groupby('status', observed=True)
     kws = dict(alpha=0.9, ls='')
     for lbl, grp, m in zip(*zip(*groups), MARKERS):
         ax.plot(grp.age, grp.idle, label=lbl, marker=m, **kws)
@@ -188,8 +422,10 @@ def priority_vs_severity_bars(data, ax):
     data -- pandas.DataFrame
     ax -- matplotlib.axes.Axes
     """
+    if data.empty:
+        return ax
     data.copy().assign(N=1).groupby(
-        ['priority', 'severity']
+        ['priority', 'severity'], observed=True
     ).N.sum().unstack().plot.bar(stacked=True, ax=ax)
     return ax
 
@@ -207,6 +443,8 @@ def status_pie(data, ax, n=4):
     ax -- matplotlib.axes.Axes
     """
     ys = data.status.value_counts()
+    if not ys.any():
+        return ax
     selected = ys.nlargest(n)
     other = sum(v for k, v in ys.items() if k not in selected.index.tolist())
     items = list(selected.items()) + [('Other', other)] if other > 0 else list(selected.items())
@@ -228,6 +466,8 @@ def pqm_pie(data, ax, n=4):
     ax -- matplotlib.axes.Axes
     """
     ys = data.PQM.value_counts()
+    if not ys.any():
+        return ax
     selected = ys.nlargest(n)
     other = sum(v for k, v in ys.items() if k not in selected.index.tolist())
     items = list(selected.items()) + [('Other', other)] if other > 0 else list(selected.items())
@@ -249,14 +489,18 @@ def created_vs_resolved_cumul(data, ax):
     data -- pandas.DataFrame
     ax -- matplotlib.axes.Axes
     """
+    colors = _palette()
     columns = ('created', 'resolved')
     x = data.index
     ys = [data[col].cumsum() for col in columns]
-    for y, lbl, color in zip(ys, ['Created', 'Resolved'], [RED, GREEN]):
+    for y, lbl, color in zip(ys, ['Created', 'Resolved'],
+                             [colors['RED'], colors['GREEN']]):
         ax.plot(x, y, label=lbl, color=color)
     y1, y2 = ys
-    ax.fill_between(x, y1, y2, where=y1 >= y2, facecolor=RED, alpha=0.1)
-    ax.fill_between(x, y2, y1, where=y2 >= y1, facecolor=GREEN, alpha=0.1)
+    ax.fill_between(x, y1, y2, where=y1 >= y2, facecolor=colors['RED'],
+                    alpha=0.1)
+    ax.fill_between(x, y2, y1, where=y2 >= y1, facecolor=colors['GREEN'],
+                    alpha=0.1)
     return ax
 
 
@@ -275,7 +519,7 @@ def unresolved_cumul(data, ax):
     """
     x = data.index
     y = data.created.cumsum() - data.resolved.cumsum()
-    ax.plot(x, y, label='$\Delta$ Unresolved', color=BLUE)
+    ax.plot(x, y, label='$\Delta$ Unresolved', color=_palette()['BLUE'])
     return ax
 
 
@@ -292,14 +536,18 @@ def created_vs_resolved_rolling(data, ax):
     data -- pandas.DataFrame
     ax -- matplotlib.axes.Axes
     """
+    colors = _palette()
     columns = ('created', 'resolved')
     x = data.index
-    ys = [data[col].rolling(7).mean() for col in columns]
-    for y, lbl, color in zip(ys, ['Created', 'Resolved'], [RED, GREEN]):
+    ys = [_rolling(data, col) for col in columns]
+    for y, lbl, color in zip(ys, ['Created', 'Resolved'],
+                             [colors['RED'], colors['GREEN']]):
         ax.plot(x, y, label=lbl, color=color)
     y1, y2 = ys
-    ax.fill_between(x, y1, y2, where=y1 >= y2, facecolor=RED, alpha=0.1)
-    ax.fill_between(x, y2, y1, where=y2 >= y1, facecolor=GREEN, alpha=0.1)
+    ax.fill_between(x, y1, y2, where=y1 >= y2, facecolor=colors['RED'],
+                    alpha=0.1)
+    ax.fill_between(x, y2, y1, where=y2 >= y1, facecolor=colors['GREEN'],
+                    alpha=0.1)
     return ax
 
 
@@ -318,24 +566,44 @@ def responsiveness_rolling(data, ax):
     """
     columns = ('FRT_10', 'TRT_20', 'created')
     x = data.index
-    y1, y2, total = [data[col].rolling(7).mean() for col in columns]
-    y1.loc[TODAY - pd.tseries.offsets.BDay(10):] = np.nan
-    y2.loc[TODAY - pd.tseries.offsets.BDay(20):] = np.nan
-    ax.plot(x, y1 * 100 / total, label='% Investigated < 10BD', color=BLUE, ls='--')
-    ax.plot(x, y2 * 100 / total, label='% Resolved < 20BD', color=BLUE)
+    y1, y2, total = [_rolling(data, col).copy() for col in columns]
+    y1.loc[TODAY - BDay(10):] = np.nan
+    y2.loc[TODAY - BDay(20):] = np.nan
+    blue = _palette()['BLUE']
+    ax.plot(x, y1 * 100 / total, label='% Investigated < 10BD', color=blue,
+            ls='--')
+    ax.plot(x, y2 * 100 / total, label='% Resolved < 20BD', color=blue)
     ax.set_ylim([0, 100])
     return ax
 
 
 def plot(active, trend, options):
+    """
+    Returns the iTrack report Figure of `active` and `trend`.
+
+    The figure is created through the object-oriented API, without pyplot,
+    so it isn't tied to an interactive backend and can be rendered in any
+    process.
+
+    Parameters
+    ----------
+    active -- pandas.DataFrame
+    trend -- pandas.DataFrame
+        Trend frame as returned by `calculate_trend`
+    options -- dict
+        Mapping with the 'name' of the report
+    """
+    from matplotlib.figure import Figure
+    _seaborn()
 
-    fig = plt.figure(figsize=(11, 11))
+    fig = Figure(figsize=(11, 11))
     fig.suptitle(options['name'])
 
     grid_specs = [(0, 0, 3, 1), (1, 0, 3, 1), (2, 0, 3, 1), (3, 0, 3, 1),
                   (0, 3, 3, 1), (1, 3, 3, 1), (2, 3, 3, 1), (3, 3, 3, 1),]
 
-    axes = [plt.subplot2grid((4, 5), (x, y), colspan=c, rowspan=r)
+    grid = fig.add_gridspec(4, 5)
+    axes = [fig.add_subplot(grid[x:x + r, y:y + c])
             for x, y, c, r in grid_specs]
 
     created_vs_resolved_cumul(trend, axes[0])
@@ -347,7 +615,7 @@ def plot(active, trend, options):
     priority_vs_severity_bars(active, axes[6])
     pqm_pie(active, axes[7])
 
-    plt.tight_layout()
+    fig.tight_layout()
     fig.subplots_adjust(bottom=0.1, top=0.9)
 
     created = int(trend.created.sum())
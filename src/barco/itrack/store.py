@@ -0,0 +1,149 @@
+"""Provides a local store to incrementally sync iTrack issues."""
+import os
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+from traitlets import HasTraits, Unicode
+
+from . import api
+from .parser import busday_count
+
+# JQL format string to search the issues updated since a given date
+_DELTA = '({}) and updated >= "{:%Y-%m-%d}"'
+
+# Logger instance
+_logger = logging.getLogger(__name__)
+
+
+def refresh_age(data, today=None):
+    """
+    Returns `data` with the `age` and `idle` business day counts recomputed
+    against `today`, as stored issues were parsed on an earlier date.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        DataFrame as returned by `api.search`
+    today : datetime.date
+        Date to count up to, defaults to the current date.
+    """
+    # an empty search result has no columns to count with
+    if data.empty:
+        return data
+    return data.assign(
+        age=busday_count(data.created, data.closuredate, today),
+        idle=busday_count(data.updated, None, today)
+    )
+
+
+class IssueStore(HasTraits):
+    """
+    A local store of iTrack issues, keyed by issue key, which is kept in sync
+    with iTrack by only fetching the issues updated since the previous sync.
+
+    The JQL query of a stored query is stored along with its issues, and a
+    sync with a different query fetches all issues again instead of merging
+    them. Note that issues which stop matching a query without being updated,
+    e.g. because they were deleted, are kept in the store until a full sync.
+    """
+
+    path = Unicode(help='Directory to persist the stored issues in')
+
+    def _filename(self, name):
+        return os.path.join(self.path, name + '.pkl')
+
+    def _read(self, name):
+        try:
+            return pd.read_pickle(self._filename(name))
+        except FileNotFoundError:
+            return None
+
+    def load(self, name):
+        """
+        Returns the stored issues DataFrame and the date of its last sync, or
+        `None` for both when `name` was never synced.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the stored query.
+        """
+        obj = self._read(name)
+        if obj is None:
+            return None, None
+        return obj['data'], obj['watermark']
+
+    def save(self, name, data, watermark, jql=None):
+        """
+        Persists the `data` DataFrame of stored query `name`, synced at
+        `watermark` with query `jql`.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the stored query.
+        data : pandas.DataFrame
+            DataFrame as returned by `api.search`
+        watermark : datetime.datetime
+            Time at which the sync started.
+        jql : unicode
+            JQL query string the issues were fetched with.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        filename = self._filename(name)
+        pd.to_pickle(dict(data=data, watermark=watermark, jql=jql),
+                     filename + '.tmp')
+        os.replace(filename + '.tmp', filename)
+
+    def sync(self, name, jql, full=False, with_delta=False, **kws):
+        """
+        Returns a DataFrame with all the issues matching `jql`, the same way
+        `api.search` does, after syncing stored query `name` with iTrack.
+
+        The first sync, a `full` one, or one with a different `jql` than the
+        previous sync fetches all issues. Later syncs only fetch the issues
+        updated since the day before the previous sync, which covers
+        differences between the local and server timezones, and merge them
+        into the stored issues.
+
+        The issues are searched `strict`-ly: a failed request raises, and
+        leaves the store and the date of its last sync as they were, instead
+        of storing an incomplete result as synced.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the stored query.
+        jql : unicode
+            JQL query string
+        full : bool
+            Whether to fetch all issues, regardless of a previous sync.
+        with_delta : bool
+            Whether to also return a DataFrame with the fetched issues, i.e.
+            the changed and new ones, or all of them for a full sync.
+        kws : dict
+            Keyword arguments passed to `api.search`, except a `cache`, which
+            would return the issues of an earlier sync of the same query.
+        """
+        kws = dict(kws, strict=True, cache=None)
+        watermark = datetime.now()
+        obj = None if full else self._read(name)
+        if obj is not None and obj.get('jql') != jql:
+            _logger.info('sync() name=%s, query changed from: %s', name,
+                         obj.get('jql'))
+            obj = None
+
+        if obj is None:
+            _logger.debug('sync() name=%s, full', name)
+            data = delta = api.search(jql, **kws)
+        else:
+            data, since = obj['data'], obj['watermark'] - timedelta(days=1)
+            _logger.debug('sync() name=%s, since=%s', name, since)
+            delta = api.search(_DELTA.format(jql, since), **kws)
+            if len(delta):
+                data = pd.concat([data[~data.index.isin(delta.index)], delta])
+
+        data = refresh_age(data, watermark.date())
+        self.save(name, data, watermark, jql)
+        return (data, delta) if with_delta else data
@@ -0,0 +1,241 @@
+"""Provides the iTrack trend engine, binning event dates into business days"""
+import numpy as np
+import pandas as pd
+from traitlets import HasTraits, Dict, Int
+
+# trend measures, (date column, value column, aggregation)
+TRENDS = dict(
+    created=('created', 'N', 'sum'),
+    resolved=('closuredate', 'N', 'sum'),
+    FRT_10=('created', 'FRT_10', 'mean'),
+    TRT_20=('created', 'TRT_20', 'mean')
+)
+# suffix of the rolling mean columns
+ROLLING = '_MA'
+WINDOW = 7
+
+# 1970-01-01 is a Thursday, shift the day numbers so 0 is a Monday
+_MONDAY = 3
+
+
+def to_ordinals(values):
+    """
+    Returns the business day ordinals of the date `values`, weekend days
+    belonging to the preceding Friday like `resample('B')` does, and a mask
+    of the valid dates.
+
+    Parameters
+    ----------
+    values -- array-like of dates
+    """
+    days = np.asarray(values, dtype='datetime64[D]')
+    valid = ~np.isnat(days)
+    weeks, weekday = np.divmod(days.view(np.int64) + _MONDAY, 7)
+    return weeks * 5 + np.minimum(weekday, 4), valid
+
+
+def from_ordinals(ordinals):
+    """
+    Returns the dates of the business day `ordinals` as a `DatetimeIndex`.
+
+    Parameters
+    ----------
+    ordinals -- numpy.ndarray
+    """
+    weeks, weekday = np.divmod(np.asarray(ordinals, dtype=np.int64), 5)
+    days = (weeks * 7 + weekday - _MONDAY).astype('datetime64[D]')
+    return pd.DatetimeIndex(days.astype('datetime64[ns]'), freq='B',
+                            name='DT')
+
+
+def rolling_mean(values, window=WINDOW):
+    """
+    Returns the rolling mean of `values` over `window` items, which is missing
+    for the first items and for any window with a missing value.
+
+    Parameters
+    ----------
+    values -- numpy.ndarray
+    window -- int
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        result[window - 1:] = windows.mean(axis=1)
+    return result
+
+
+def _values(data, column):
+    values = np.asarray(data[column], dtype=np.float64)
+    present = ~np.isnan(values)
+    return np.where(present, values, 0), present
+
+
+class Bins(HasTraits):
+    """
+    Per business day sums and numbers of values and events of the trend
+    measures, the state the trend frame is computed from.
+
+    Issues are added to the bins, or removed from them with a negative sign,
+    so the bins of changed issues can be updated without rebinning the others.
+    """
+
+    trends = Dict(help='Mapping of trend names to (date column, value column, '
+                       'aggregation) tuples')
+    lo = Int(0, help='Business day ordinal of the first bin')
+    sums = Dict(help='Mapping of the trend names to the per bin sums')
+    counts = Dict(help='Mapping of the trend names to the per bin numbers of '
+                       'values')
+    events = Dict(help='Mapping of the trend names to the per bin numbers of '
+                       'events, i.e. of issues with a date')
+    integer = Dict(help='Mapping of the trend names to whether their sums are '
+                        'integers')
+
+    def __len__(self):
+        return max((len(v) for v in self.events.values()), default=0)
+
+    def _extend(self, lo, hi):
+        # grows the bins to cover ordinals `lo` to `hi`
+        lo = min(lo, self.lo) if len(self) else lo
+        hi = max(hi, self.lo + len(self) - 1) if len(self) else hi
+        before, after = self.lo - lo, hi - lo + 1
+        for bins in (self.sums, self.counts, self.events):
+            for name in self.trends:
+                old = bins.get(name, ())
+                new = np.zeros(after)
+                new[before:before + len(old)] = old
+                bins[name] = new
+        self.lo = int(lo)
+
+    def add(self, data, sign=1):
+        """
+        Adds the events of the issues in `data` to the bins, binning every
+        date column once.
+
+        Parameters
+        ----------
+        data -- pandas.DataFrame
+        sign -- int
+            Sign of the contributions, -1 to remove issues
+        """
+        ordinals = {x: to_ordinals(data[x])
+                    for x in set(x for x, _, _ in self.trends.values())}
+        valid = [o[m] for o, m in ordinals.values() if m.any()]
+        if valid:
+            self._extend(min(v.min() for v in valid),
+                         max(v.max() for v in valid))
+        else:
+            # no dates to bin, but the bins of every trend must exist
+            self._extend(self.lo, self.lo - 1)
+
+        for name, (x, y, agg) in self.trends.items():
+            days, mask = ordinals[x]
+            values, present = _values(data, y)
+            bins, length = days[mask] - self.lo, len(self)
+            self.sums[name] += sign * np.bincount(
+                bins, weights=values[mask], minlength=length)
+            self.counts[name] += sign * np.bincount(
+                bins, weights=present[mask], minlength=length)
+            self.events[name] += sign * np.bincount(bins, minlength=length)
+            self.integer.setdefault(name, agg == 'sum' and
+                                    np.issubdtype(data[y].dtype, np.integer))
+        return self
+
+    def bounds(self, name):
+        """
+        Returns the first and last ordinals with events of trend `name`, or
+        `None` when it has no events.
+
+        Parameters
+        ----------
+        name -- unicode
+        """
+        days = np.flatnonzero(self.events.get(name, ()))
+        return (self.lo + days[0], self.lo + days[-1]) if len(days) else None
+
+
+def bin_trends(data, trends=None):
+    """
+    Returns the `Bins` of `data`, binning every date column once.
+
+    Parameters
+    ----------
+    data -- pandas.DataFrame
+    trends -- dict
+        Mapping of trend names to (date column, value column, aggregation)
+        tuples, defaults to `TRENDS`
+    """
+    return Bins(trends=TRENDS if trends is None else trends).add(data)
+
+
+def trend_frame(bins, trends=None, start=None, window=WINDOW):
+    """
+    Returns the trend frame of `bins`, one row per business day with a column
+    per trend and its rolling mean.
+
+    Parameters
+    ----------
+    bins -- Bins
+    trends -- dict
+        Mapping of trend names to (date column, value column, aggregation)
+        tuples, defaults to the trends of `bins`
+    start -- datetime.date
+        First day of the trend frame
+    window -- int
+        Number of business days of the rolling means
+    """
+    trends = bins.trends if trends is None else trends
+    bounds = dict((name, bins.bounds(name)) for name in trends)
+    days = [b for b in bounds.values() if b is not None]
+    first_day = lo = min((b[0] for b in days), default=bins.lo)
+    hi = max((b[1] for b in days), default=lo - 1)
+    if start is not None:
+        # a weekend start begins with the next Monday
+        start = np.datetime64(start, 'D')
+        lo = max(lo, to_ordinals([start])[0][0] + (not np.is_busday(start)))
+    index = np.arange(lo, hi + 1)
+    bin_index = index - bins.lo
+
+    columns = {}
+    for name, (_, _, agg) in trends.items():
+        sums = bins.sums[name][bin_index]
+        if agg == 'mean':
+            counts = bins.counts[name][bin_index]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = np.where(counts > 0, sums / counts, 0)
+        else:
+            values = sums
+        # like aligning per trend time series, days outside of the events of
+        # a trend are missing, which makes it a float column
+        first, last = bounds[name] or (hi + 1, hi)
+        if (first, last) != (first_day, hi):
+            values = np.where((index < first) | (index > last), np.nan,
+                              values)
+        elif bins.integer[name]:
+            values = np.rint(values).astype(np.int64)
+        columns[name] = values
+
+    frame = pd.DataFrame(columns, index=from_ordinals(index))
+    rolling = {name + ROLLING: rolling_mean(frame[name], window)
+               for name in trends}
+    return pd.concat([frame, pd.DataFrame(rolling, index=frame.index)],
+                     axis=1)
+
+
+def calculate(data, start=None, trends=None, window=WINDOW):
+    """
+    Returns the trend frame of `data` in a single pass, see `trend_frame`.
+
+    Parameters
+    ----------
+    data -- pandas.DataFrame
+    start -- datetime.date
+        First day of the trend frame
+    trends -- dict
+        Mapping of trend names to (date column, value column, aggregation)
+        tuples, defaults to `TRENDS`
+    window -- int
+        Number of business days of the rolling means
+    """
+    return trend_frame(bin_trends(data, trends), trends, start, window)
@@ -1,104 +1,21 @@
+"""Provides calendar heatmaps of daily counts, as SVG or HTML"""
+import io
+import os
 import datetime
-from functools import reduce
-from itertools import groupby
-from operator import itemgetter
+import functools
+from contextlib import contextmanager
+from itertools import islice
 
+import numpy as np
 import pandas as pd
-from IPython.display import display_html, display_svg
 
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec')
+# colours of the days without, and with increasingly more counts
+COLORS = ('#eee', '#c6e48b', '#7bc96f', '#239a3b', '#196127')
 
-def matrix_svg(value_counts, ranges=(3, 5, 10), display=True):
-
-    MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
-              'Oct', 'Nov', 'Dec')
-
-    def get_color(count):
-        if count == 0:
-            return '#eee'
-        elif count < ranges[0]:
-            return '#c6e48b'
-        elif count < ranges[1]:
-            return '#7bc96f'
-        elif count < ranges[2]:
-            return '#239a3b'
-        else:
-            return '#196127'
-
-
-    def build_svg_day(weekday, date, month, count, x):
-        fmt = ('<rect class="day" width="10" height="10" x="{x}" y="{y}" ' +
-               'fill="{color}" data-count="{count}" data-date="{date}"></rect>')
-        y = weekday * 12
-        color = get_color(count)
-        return fmt.format(x=x, y=y, color=color, count=count, date=date)
-
-
-    def build_svg_week(week, days):
-        svg = '<g transform="translate({x}, 0)">'.format(x=week * 13)
-        x = 13 - week
-        for day in days:
-
-            svg += build_svg_day(*day, x)
-        return svg + '</g>'
-
-
-    def build_svg_month(x, month):
-        return '<text x="{x}" y="{y}" class="month">{month}</text>'.format(
-            x=x, y=-10, month=month)
-
-
-    def build_svg(dates, width=674, height=104):
-
-        def list_date_tuples(start, end, counter):
-            today = datetime.date.today()
-
-            def _init_date_tuple(date):
-                return (date.weekday(), date, MONTHS[date.month - 1],
-                        counter(date))
-
-            return [_init_date_tuple(d)
-                    for d in (today - datetime.timedelta(days=start + x)
-                    for x in reversed(range(end)))]
-
-        def build_counter(xs, ys):
-            def _inner(x):
-                t = pd.Timestamp(x)
-                return ys[xs.index(t)] if t in xs else 0
-            return _inner
-
-        # build the counter from `dates` -- this allows us to count how many
-        # tickets are linked to a given `date`
-        counter = build_counter(*list(zip(*dates)))
-
-        # build a weeekday, date, month tuple list
-        days = list_date_tuples(0, 365, counter)
-
-        # ensure we start with a 1st day of the week -- a.k.a. Monday
-        days = list_date_tuples(365, days[0][0], counter) + days
-
-        def split(acc, curr):
-            xs, i = acc
-            if curr[0] == 0:
-                return xs + [[curr]], i + 1
-            xs[i] = xs[i] + [curr]
-            return xs, i
-
-        weeks = list(reduce(split, days, ([[]], 0))[0])
-
-        def reducer(y, x):
-            if len(y) > 0:
-                prev = y[-1]
-                if prev[1] == x[1]:
-                    return y + [(prev[0] + 1, x[1])]
-            return y + [x]
-
-        months = [max(x[1]) for x in groupby(reduce(reducer, [(1, x[2])
-                  for x in days if x[0] == 0], []), itemgetter(1))]
-
-        svg = ('<svg width="{width}" height="{height}" ' +
-               'class="js-calendar-graph-svg">').format(width=width,
-                                                        height=height)
-        svg += '''<style>
+_SVG = '<svg width="{width}" height="{height}" class="js-calendar-graph-svg">'
+_STYLE = '''<style>
         rect {
             shape-rendering: crispedges;
         }
@@ -111,17 +28,14 @@ def matrix_svg(value_counts, ranges=(3, 5, 10), display=True):
             fill: #767676;
         }
         </style>'''
-        svg += '<g transform="translate(16, 20)">'
-        for i, week in enumerate(weeks):
-            svg += build_svg_week(i, week)
-        x = 12 + (months[0][0] * 12 if months[0][0] < 3 else 0)
-        for i, month in enumerate(months):
-            n, name = month
-            if n > 2:
-                svg += build_svg_month(x, name)
-                x += n * 12
-
-        svg += '''
+_WEEK = '<g transform="translate({:d}, 0)">'
+# a day is filled in as BEFORE + colour + COUNT + count + AFTER
+_DAY_BEFORE = ('<rect class="day" width="10" height="10" x="{:d}" y="{:d}" '
+               'fill="')
+_DAY_COUNT = '" data-count="'
+_DAY_AFTER = '" data-date="{}"></rect>'
+_MONTH = '<text x="{:d}" y="-10" class="month">{}</text>'
+_WEEKDAYS = '''
         <text text-anchor="start" class="wday" dx="-14" dy="8"
             style="display: none;">Mon</text>
         <text text-anchor="start" class="wday" dx="-14" dy="20">Tue</text>
@@ -133,18 +47,7 @@ def matrix_svg(value_counts, ranges=(3, 5, 10), display=True):
         <text text-anchor="start" class="wday" dx="-14" dy="69">Sat</text>
         <text text-anchor="start" class="wday" dx="-14" dy="81"
             style="display: none;">Sun</text>'''
-        svg += '</g>'
-        svg += '</svg>'
-        return svg
-
-    result = build_svg(value_counts.items())
-
-    return display_svg(result, raw=True) if display else result
-
-
-def matrix_chart(value_counts, title, ranges=(3, 5, 10)):
-
-    style = '''
+_CHART_STYLE = '''
     <style>
     .contrib-legend {
         float: right;
@@ -195,7 +98,7 @@ def matrix_chart(value_counts, title, ranges=(3, 5, 10)):
         overflow: hidden;
     }
     </style>'''
-    html = '''
+_CHART = '''
     <div class="border">
         <div class="calendar-graph">{svg}</div>
         <div class="contrib-footer">
@@ -204,17 +107,353 @@ def matrix_chart(value_counts, title, ranges=(3, 5, 10)):
                  title="A summary of service tickets opened in last 356 days.">
                 Less
                 <ul class="legend">
-                    <li style="background-color: #eee"></li>
-                    <li style="background-color: #c6e48b"></li>
-                    <li style="background-color: #7bc96f"></li>
-                    <li style="background-color: #239a3b"></li>
-                    <li style="background-color: #196127"></li>
+                    {legend}
                 </ul>
                 More
             </div>
         </div>
     </div>'''
-    return display_html(
-        style + html.format(
-            title=title, svg=matrix_svg(value_counts, ranges), display=False),
-        raw=True)
+
+# number of event dates counted at once, see `bin_counts`
+CHUNK_SIZE = 64 * 1024
+# quantiles of the daily counts used as colour thresholds, see `color_ranges`
+QUANTILES = (0.25, 0.5, 0.75)
+
+# 1970-01-01 is a Thursday
+_THURSDAY = 3
+
+
+def calendar_days(end=None, days=365):
+    """
+    Returns the dates of the calendar of `days` ending on `end`, extended to
+    start on a Monday.
+
+    Parameters
+    ----------
+    end -- datetime.date
+        Last day of the calendar, defaults to today
+    days -- int
+        Number of days of the calendar
+    """
+    end = np.datetime64(end or datetime.date.today(), 'D')
+    start = end - (days - 1)
+    start -= (start.astype(np.int64) + _THURSDAY) % 7
+    return np.arange(start, end + 1)
+
+
+def _bin_days(values, dates, weights=None):
+    # counts the `values`, or sums their `weights`, per day of `dates`
+    values = np.asarray(values)
+    if values.dtype.kind != 'M':
+        # e.g. date objects, or timestamps mixed with missing values
+        values = pd.to_datetime(values)
+    values = np.asarray(values, dtype='datetime64[D]')
+    offsets = (values - dates[0]).astype(np.int64)
+    mask = (offsets >= 0) & (offsets < len(dates))
+    counts = np.bincount(offsets[mask], minlength=len(dates),
+                         weights=None if weights is None else weights[mask])
+    if weights is not None and np.issubdtype(weights.dtype, np.integer):
+        counts = counts.astype(np.int64)
+    return counts
+
+
+def bin_counts(data, dates):
+    """
+    Returns the counts of `data` per day of `dates`, ignoring the days outside
+    of `dates`.
+
+    `data` is either a Series of counts indexed by date, as returned by
+    `value_counts`, or the event dates themselves, e.g. a column of
+    timestamps. An iterator of event dates is consumed in chunks of
+    `CHUNK_SIZE`, so it's counted in bounded memory.
+
+    Parameters
+    ----------
+    data -- pandas.Series, array-like or iterator
+        Counts indexed by date, or event dates
+    dates -- numpy.ndarray
+        Consecutive days, see `calendar_days`
+    """
+    if isinstance(data, pd.Series) and not (
+            pd.api.types.is_datetime64_any_dtype(data.dtype) or
+            data.dtype == object):
+        return _bin_days(data.index, dates, np.asarray(data))
+    if isinstance(data, (pd.Series, pd.Index, np.ndarray, list, tuple)):
+        return _bin_days(data, dates)
+
+    iterator = iter(data)
+    counts = np.zeros(len(dates), dtype=np.int64)
+    while True:
+        chunk = list(islice(iterator, CHUNK_SIZE))
+        if not chunk:
+            return counts
+        counts += _bin_days(chunk, dates)
+
+
+def color_ranges(counts, ranges=(3, 5, 10)):
+    """
+    Returns the colour thresholds `ranges`, or when `ranges` is 'quantile',
+    the `QUANTILES` of the days with counts in `counts`.
+
+    Parameters
+    ----------
+    counts -- numpy.ndarray
+    ranges -- tuple or unicode
+        Increasing thresholds of the colours, or 'quantile'
+    """
+    if isinstance(ranges, str):
+        if ranges != 'quantile':
+            raise ValueError('unsupported ranges: {!r}'.format(ranges))
+        counts = counts[counts > 0]
+        if not len(counts):
+            return ()
+        return tuple(np.quantile(counts, QUANTILES, method='higher'))
+    return ranges
+
+
+def count_colors(counts, ranges=(3, 5, 10)):
+    """
+    Returns the indices in `COLORS` of `counts`, binned by the thresholds in
+    `ranges`, see `color_ranges`.
+
+    Parameters
+    ----------
+    counts -- numpy.ndarray
+    ranges -- tuple or unicode
+        Increasing thresholds of the colours, or 'quantile'
+    """
+    ranges = color_ranges(counts, ranges)
+    levels = np.searchsorted(ranges, counts, side='right') + 1
+    return np.where(counts == 0, 0, levels)
+
+
+def _month_runs(dates):
+    # yields the number of consecutive weeks starting in a month, and its name
+    months = dates[::7].astype('datetime64[M]').astype(np.int64)
+    bounds = np.r_[0, np.flatnonzero(np.diff(months)) + 1, len(months)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        yield hi - lo, MONTHS[months[lo] % 12]
+
+
+class CalendarLayout(object):
+    """
+    The SVG skeleton of a calendar heatmap, i.e. everything but the colour and
+    count of its days, which are filled in per series.
+
+    Parameters
+    ----------
+    dates -- numpy.ndarray
+        Consecutive days starting on a Monday, see `calendar_days`
+    width, height -- int
+        Size of the SVG, the width defaults to fit the weeks of `dates`
+    """
+
+    def __init__(self, dates, width=None, height=104):
+        self.dates = dates
+        if width is None:
+            # 53 weeks of 12 pixels fit the default width
+            width = 674 + 12 * max(0, (len(dates) + 6) // 7 - 53)
+        self._head = ''.join([
+            _SVG.format(width=width, height=height), _STYLE,
+            '<g transform="translate(16, 20)">',
+            # the first week column is left empty
+            _WEEK.format(0), '</g>'
+        ])
+
+        # the markup of every day up to its count, for each of the colours,
+        # and after its count
+        before, after = [], []
+        for i, label in enumerate(dates.astype(str)):
+            week, weekday = divmod(i, 7)
+            markup = _DAY_BEFORE.format(12 - week, weekday * 12)
+            if weekday == 0:
+                markup = _WEEK.format((week + 1) * 13) + markup
+            before.append([markup + color + _DAY_COUNT for color in COLORS])
+            last = weekday == 6 or i == len(dates) - 1
+            after.append(_DAY_AFTER.format(label) + ('</g>' if last else ''))
+        self._before = np.array(before, dtype=object)
+        self._after = np.array(after, dtype=object)
+
+        tail = []
+        runs = list(_month_runs(dates))
+        x = 12 + (runs[0][0] * 12 if runs and runs[0][0] < 3 else 0)
+        for n, name in runs:
+            # months with less than three weeks aren't labelled
+            if n > 2:
+                tail.append(_MONTH.format(x, name))
+                x += n * 12
+        self._tail = ''.join(tail + [_WEEKDAYS, '</g>', '</svg>'])
+
+    def iter_svg(self, counts, ranges=(3, 5, 10)):
+        """
+        Yields the parts of the SVG calendar heatmap of `counts` per day.
+
+        Parameters
+        ----------
+        counts -- numpy.ndarray
+            Counts per day of the layout, see `bin_counts`
+        ranges -- tuple or unicode
+            Increasing thresholds of the colours, or 'quantile'
+        """
+        days = np.empty(3 * len(self.dates), dtype=object)
+        days[0::3] = self._before[np.arange(len(self.dates)),
+                                  count_colors(counts, ranges)]
+        days[1::3] = counts.astype(str)
+        days[2::3] = self._after
+        yield self._head
+        yield ''.join(days.tolist())
+        yield self._tail
+
+    def render(self, counts, ranges=(3, 5, 10)):
+        """
+        Returns the SVG calendar heatmap of `counts` per day, see `iter_svg`.
+        """
+        return ''.join(self.iter_svg(counts, ranges))
+
+
+@functools.lru_cache(maxsize=32)
+def _calendar_layout(end, days):
+    return CalendarLayout(calendar_days(end, days))
+
+
+def calendar_layout(end=None, days=365):
+    """
+    Returns the, cached, `CalendarLayout` of `days` ending on `end`.
+
+    Parameters
+    ----------
+    end -- datetime.date
+        Last day of the calendar, defaults to today
+    days -- int
+        Number of days of the calendar
+    """
+    return _calendar_layout(np.datetime64(end or datetime.date.today(), 'D'),
+                            days)
+
+
+@contextmanager
+def _writer(fp):
+    # yields a text stream writing to file name `fp`, or `fp` itself
+    if isinstance(fp, (str, os.PathLike)):
+        with open(fp, 'w', encoding='utf-8') as stream:
+            yield stream
+    else:
+        yield fp
+
+
+def _display(kind, content):
+    # IPython is only imported when displaying, so rendering runs headless
+    from IPython import display
+    return getattr(display, 'display_' + kind)(content, raw=True)
+
+
+def write_svg(fp, data, ranges=(3, 5, 10), end=None, days=365):
+    """
+    Writes the SVG calendar heatmap of `data` over `days` ending on `end` to
+    `fp`, see `matrix_svg`.
+
+    Parameters
+    ----------
+    fp -- unicode or file-like
+        File name, or text stream to write to
+    """
+    layout = calendar_layout(end, days)
+    with _writer(fp) as stream:
+        stream.writelines(layout.iter_svg(bin_counts(data, layout.dates),
+                                          ranges))
+
+
+def matrix_svg(data, ranges=(3, 5, 10), display=True, end=None, days=365):
+    """
+    Returns the SVG calendar heatmap of `data` over `days` ending on `end`, or
+    displays it in IPython.
+
+    Parameters
+    ----------
+    data -- pandas.Series, array-like or iterator
+        Counts indexed by date, or event dates, see `bin_counts`
+    ranges -- tuple or unicode
+        Increasing thresholds of the colours, or 'quantile'
+    display -- bool
+        Whether to display the SVG, instead of returning it
+    end -- datetime.date
+        Last day of the calendar, defaults to today
+    days -- int
+        Number of days of the calendar
+    """
+    stream = io.StringIO()
+    write_svg(stream, data, ranges, end, days)
+    result = stream.getvalue()
+
+    return _display('svg', result) if display else result
+
+
+def matrix_svgs(series, ranges=(3, 5, 10), end=None, days=365):
+    """
+    Returns a mapping of the names in `series` to the SVG calendar heatmaps
+    of their data, which share a single `CalendarLayout`.
+
+    Parameters
+    ----------
+    series -- dict
+        Mapping of names to counts indexed by date, or event dates, see
+        `bin_counts`
+    ranges -- tuple or unicode
+        Increasing thresholds of the colours, or 'quantile'
+    end -- datetime.date
+        Last day of the calendars, defaults to today
+    days -- int
+        Number of days of the calendars
+    """
+    layout = calendar_layout(end, days)
+    return {name: layout.render(bin_counts(data, layout.dates), ranges)
+            for name, data in series.items()}
+
+
+def _chart_html(svg, title):
+    legend = '\n                    '.join(
+        '<li style="background-color: {}"></li>'.format(c) for c in COLORS)
+    return _CHART.format(svg=svg, title=title, legend=legend)
+
+
+def write_page(fp, series, ranges=(3, 5, 10), end=None, days=365):
+    """
+    Writes an HTML page with the calendar heatmap chart of every series in
+    `series` to `fp`, one chart at a time, see `matrix_page`.
+
+    Parameters
+    ----------
+    fp -- unicode or file-like
+        File name, or text stream to write to
+    """
+    layout = calendar_layout(end, days)
+    with _writer(fp) as stream:
+        stream.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">')
+        stream.write(_CHART_STYLE)
+        stream.write('\n</head>\n<body>')
+        for title, data in series.items():
+            svg = layout.render(bin_counts(data, layout.dates), ranges)
+            stream.write(_chart_html(svg, title))
+        stream.write('\n</body>\n</html>\n')
+
+
+def matrix_page(series, ranges=(3, 5, 10), end=None, days=365):
+    """
+    Returns an HTML page with the calendar heatmap chart of every series in
+    `series`, titled by its name, see `matrix_svgs`.
+    """
+    stream = io.StringIO()
+    write_page(stream, series, ranges, end, days)
+    return stream.getvalue()
+
+
+def matrix_chart(data, title, ranges=(3, 5, 10), end=None, days=365,
+                 display=True):
+    """
+    Returns the HTML calendar heatmap chart of `data`, titled `title`, or
+    displays it in IPython, see `matrix_svg`.
+    """
+    result = _CHART_STYLE + _chart_html(
+        matrix_svg(data, ranges, display=False, end=end, days=days), title)
+
+    return _display('html', result) if display else result
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# Max seconds to import `barco.itrack.reporting`, on top of its third-party
+# dependencies that are needed anyway to load data
+BUDGET = 0.25
+
+_SCRIPT = '''
+import json, sys, time
+import numpy, pandas, requests, traitlets
+start = time.perf_counter()
+import barco.itrack.reporting
+elapsed = time.perf_counter() - start
+heavy = ('matplotlib', 'seaborn', 'cryptography', 'pkg_resources')
+print(json.dumps(dict(elapsed=elapsed,
+                      imported=[m for m in heavy if m in sys.modules])))
+'''
+_MATRIX_SCRIPT = '''
+import io, json, sys
+import barco.matrix
+barco.matrix.write_page(io.StringIO(), dict(a=[]))
+print(json.dumps(dict(imported=[m for m in ('IPython', 'matplotlib')
+                                if m in sys.modules])))
+'''
+
+
+class TestImport(unittest.TestCase):
+
+    def test_reporting_import(self):
+        env = {k: v for k, v in os.environ.items()
+               if not k.startswith('ITRACK')}
+        out = subprocess.run([sys.executable, '-c', _SCRIPT], env=env,
+                             check=True, stdout=subprocess.PIPE).stdout
+        result = json.loads(out.decode('utf-8'))
+        self.assertEqual(result['imported'], [])
+        self.assertLess(result['elapsed'], BUDGET)
+
+    def test_matrix_headless(self):
+        out = subprocess.run([sys.executable, '-c', _MATRIX_SCRIPT],
+                             check=True, stdout=subprocess.PIPE).stdout
+        self.assertEqual(json.loads(out.decode('utf-8'))['imported'], [])
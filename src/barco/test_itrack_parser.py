@@ -0,0 +1,124 @@
+import unittest
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from .itrack.parser import (CONVERTERS, compile_plan, compile_page_plan,
+                            parse_itrack_issue, parse_itrack_page,
+                            concat_pages, slice_page, busday_count)
+
+
+def _issue(i):
+    fields = dict(
+        assignee=dict(name='user{:d}'.format(i % 3)),
+        summary='Issue {:d}'.format(i),
+        status=dict(name=('Open', 'Closed', 'In Progress')[i % 3]),
+        issuetype=dict(name=('Problem', 'Story', 'Task')[i % 3]),
+        project=dict(name='PROJECT{:d}'.format(i % 2)),
+        priority=dict(name='P{:d} - Priority'.format(i % 4 + 1)),
+        customfield_10002=dict(value='S{:d} - Severity'.format(i % 3 + 1)),
+        customfield_10021=dict(value='Test'),
+        customfield_10232=('2018-01-{:02d}T10:00:00.000+0100'.format(i % 28 + 1)
+                           if i % 2 else None),
+        customfield_10350=('2018-02-{:02d}T10:00:00.000+0100'.format(i % 28 + 1)
+                           if i % 3 == 1 else None),
+        fixVersions=[dict(name='1.0', archived=False),
+                     dict(name='0.9', archived=True)],
+        versions=[],
+        created='2018-01-{:02d}T10:00:00.000+0100'.format(i % 28 + 1),
+        resolutiondate=None,
+        updated='2018-03-{:02d}T10:00:00.000+0100'.format(i % 28 + 1),
+        reported=dict(name='reporter'),
+        description='Description of issue {:d}'.format(i),
+    )
+    # some issues lack some fields
+    if i % 5 == 2:
+        del fields['assignee'], fields['customfield_10021']
+    return dict(key='ISSUE-{:d}'.format(i), fields=fields)
+
+
+def _fields(i):
+    fields = _issue(i)['fields']
+    # versions lists with several, archived or no names, or no list at all
+    fields['versions'] = [[dict(name='2.0', archived=False),
+                           dict(name='2.1', archived=False)],
+                          [dict(name='1.9', archived=True)],
+                          None][i % 3]
+    if i % 7 == 3:
+        del fields['priority'], fields['fixVersions']
+    return fields
+
+
+class TestCompilePlan(unittest.TestCase):
+
+    def _expected(self, fields, extra=()):
+        data = {k: f(fields[k]) for k, f in CONVERTERS.items() if k in fields}
+        data.update((k, fields[k]) for k in extra
+                    if k in fields and k not in CONVERTERS)
+        return data
+
+    def test_compile_plan(self):
+        for extra in [(), ['description', 'summary', 'missing']]:
+            convert = compile_plan(extra)
+            for i in range(30):
+                fields = _fields(i)
+                self.assertEqual(convert(fields),
+                                 self._expected(fields, extra))
+        self.assertEqual(compile_plan()(_fields(0))['versions'], '2.0,2.1')
+        self.assertEqual(compile_plan()(_fields(1))['versions'], '')
+        self.assertEqual(compile_plan()(_fields(2))['versions'], '')
+
+    def test_compile_page_plan(self):
+        for extra in [(), ['description', 'summary', 'missing']]:
+            fields = [_fields(i) for i in range(2, 30)]
+            expected = pd.DataFrame([self._expected(f, extra) for f in fields])
+            actual = pd.DataFrame(compile_page_plan(extra)(iter(fields)))
+            assert_frame_equal(actual, expected)
+        self.assertEqual(compile_page_plan()([]), {})
+
+
+class TestParseItrackPage(unittest.TestCase):
+
+    def _assert_same_frame(self, issues, extra=()):
+        expected = pd.DataFrame([parse_itrack_issue(issue, extra)
+                                 for issue in issues])
+        actual = pd.DataFrame(parse_itrack_page(iter(issues), extra))
+        assert_frame_equal(actual, expected)
+
+    def test_parse_itrack_page(self):
+        self._assert_same_frame([_issue(i) for i in range(50)])
+
+    def test_parse_itrack_page_missing_fields_first(self):
+        self._assert_same_frame([_issue(i) for i in range(2, 20)])
+
+    def test_parse_itrack_page_extra(self):
+        self._assert_same_frame([_issue(i) for i in range(10)],
+                                extra=['description'])
+
+    def test_parse_itrack_page_empty(self):
+        self.assertEqual(parse_itrack_page([]), {})
+
+    def test_concat_pages(self):
+        issues = [_issue(i) for i in range(2, 30)]
+        pages = [parse_itrack_page(issues[:10]),
+                 parse_itrack_page(issues[10:])]
+        expected = pd.DataFrame([parse_itrack_issue(issue)
+                                 for issue in issues])
+        assert_frame_equal(pd.DataFrame(concat_pages(pages)), expected)
+        assert_frame_equal(
+            pd.DataFrame(slice_page(concat_pages(pages), 5, 15)),
+            expected.iloc[5:15].reset_index(drop=True))
+
+
+class TestBusdayCount(unittest.TestCase):
+
+    def test_busday_count(self):
+        days = busday_count(['2018-01-01', None, '2018-01-01'],
+                            ['2018-01-08', '2018-01-08', None],
+                            today='2018-01-15')
+        self.assertEqual(days.tolist(), [5, 0, 10])
+
+    def test_busday_count_holidays(self):
+        days = busday_count(['2018-01-01'], ['2018-01-08'],
+                            holidays=('2018-01-01', '2018-01-02'))
+        self.assertEqual(days.tolist(), [3])
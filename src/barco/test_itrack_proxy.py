@@ -0,0 +1,366 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import requests
+
+from .itrack.api import apply_schema, search, search_chunks
+from .itrack.proxy import ITrackProxy, create_session
+from .itrack.store import IssueStore
+from .utils.cache import DiskCache
+
+try:
+    from .itrack.aio import async_search
+except ImportError:
+    async_search = None
+
+TOTAL = 25
+PAGE_SIZE = 10
+
+
+def _issue(i):
+    return dict(key='ISSUE-{:d}'.format(i), fields=dict(
+        summary='Issue {:d}'.format(i),
+        status=dict(name='Open'),
+        issuetype=dict(name='Problem'),
+        created='2018-01-{:02d}T10:00:00.000+0100'.format(i + 1),
+        updated='2018-02-{:02d}T10:00:00.000+0100'.format(i + 1),
+        resolutiondate=None,
+        customfield_10232=None,
+        customfield_10350=None,
+        description='Description of issue {:d}'.format(i),
+    ))
+
+
+def _project(issue, fields):
+    return dict(issue, fields={k: v for k, v in issue['fields'].items()
+                               if k in fields})
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        start_at = int(query['startAt'][0])
+        max_results = min(int(query['maxResults'][0]), self.server.page_size)
+        fields = query['fields'][0].split(',')
+        self.server.queries.append(query['jql'][0])
+        issues = [_project(issue, fields) for issue in
+                  self.server.issues[start_at:start_at + max_results]]
+        if start_at in self.server.fail:
+            code, obj = 500, dict(errorMessages=['Internal server error'])
+        else:
+            code, obj = 200, dict(startAt=start_at, maxResults=max_results,
+                                  total=len(self.server.issues),
+                                  issues=issues)
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        cls.server = cls.httpd.server_address
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    def setUp(self):
+        # issues the server searches and max page size it clamps requests to
+        self.serve([_issue(i) for i in range(TOTAL)])
+
+    def serve(self, issues, page_size=PAGE_SIZE, fail=()):
+        # the pages starting at the `fail` offsets fail with a server error
+        self.httpd.issues = issues
+        self.httpd.page_size = page_size
+        self.httpd.fail = set(fail)
+        self.httpd.queries = []
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+
+class TestProxy(StubServerTestCase):
+
+    def _proxy(self, **kws):
+        return ITrackProxy(auth=('', ''), server=self.server, scheme='http',
+                           **kws)
+
+    def test_search(self):
+        with self._proxy() as proxy:
+            issues, total = proxy.search('project = TEST', start_at=20)
+        self.assertEqual(total, TOTAL)
+        self.assertEqual([issue['key'] for issue in issues],
+                         [_issue(i)['key'] for i in range(20, TOTAL)])
+
+    def test_close_owned_session(self):
+        proxy = self._proxy()
+        proxy.search('project = TEST')
+        with mock.patch.object(proxy.session, 'close',
+                               wraps=proxy.session.close) as close:
+            with proxy:
+                pass
+        close.assert_called_once_with()
+
+    def test_close_passed_session(self):
+        with create_session() as session, \
+                mock.patch.object(session, 'close') as close:
+            with self._proxy(session=session) as proxy:
+                proxy.search('project = TEST')
+            self.assertIs(proxy.session, session)
+            close.assert_not_called()
+
+    def test_search_passed_session(self):
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        with create_session() as session, \
+                mock.patch.object(session, 'close') as close:
+            search('project = TEST', session=session, **kws)
+            close.assert_not_called()
+            # the session is still usable for another search
+            data = search('project = TEST', session=session, **kws)
+        self.assertEqual(len(data), TOTAL)
+
+    def test_search_stream(self):
+        with self._proxy() as proxy, self._proxy(stream=True) as streaming:
+            self.assertEqual(streaming.search('project = TEST'),
+                             proxy.search('project = TEST'))
+
+    def test_search_chunks(self):
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        pages = list(search_chunks('project = TEST', **kws))
+        chunks = list(search_chunks('project = TEST', chunksize=4, **kws))
+        self.assertEqual([len(df) for df in pages], [10, 10, 5])
+        self.assertEqual([len(df) for df in chunks], [4] * 6 + [1])
+        self.assertTrue(all(df.index.name == 'key' for df in chunks))
+
+    def test_search_workers(self):
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        for total, page_size in [(25, 10), (23, 7), (3, 7), (0, 7)]:
+            self.serve([_issue(i) for i in range(total)], page_size)
+            expected = search('project = TEST', **kws)
+            actual = search('project = TEST', workers=3, **kws)
+            self.assertEqual(len(actual), total)
+            self.assertTrue(actual.equals(expected))
+
+    def test_search_chunks_bounded(self):
+        self.serve([dict(_issue(i % TOTAL), key='ISSUE-{:d}'.format(i))
+                    for i in range(200)])
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        for extra in [dict(workers=2), dict(workers=2, processes=1)]:
+            self.serve(self.httpd.issues)
+            chunks = search_chunks('project = TEST', **kws, **extra)
+            for _ in range(2):
+                next(chunks)
+            # give the threads time to fetch more pages than they should
+            time.sleep(0.3)
+            # the first page, and the pages fetched and parsed ahead
+            self.assertLessEqual(len(self.httpd.queries), 5)
+            self.assertEqual(sum(len(df) for df in chunks), 180)
+
+    def test_search_processes(self):
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        expected = search('project = TEST', **kws)
+        actual = search('project = TEST', processes=2, workers=2, **kws)
+        self.assertTrue(actual.equals(expected))
+
+    def test_search_compact_schema(self):
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        data = search('project = TEST', **kws)
+        compact = search('project = TEST', schema='compact', **kws)
+        self.assertEqual(compact.status.dtype, 'category')
+        self.assertEqual(compact.closed.dtype, 'boolean')
+        self.assertEqual(compact.age.dtype, 'int16')
+        self.assertEqual(compact.status.cat.categories[0], 'open')
+        self.assertTrue(compact.astype(data.dtypes.to_dict()).equals(data))
+
+    def test_search_chunks_compact_schema(self):
+        issues = [_issue(i) for i in range(TOTAL)]
+        states = ['Open', 'Closed', 'In Progress']
+        for i, issue in enumerate(issues):
+            issue['fields'].update(
+                status=dict(name=states[i // 4 % 3]),
+                project=dict(name='PROJECT{:d}'.format(i // 4)))
+        self.serve(issues)
+        kws = dict(auth=('', ''), server=self.server, scheme='http')
+        chunks = list(search_chunks('project = TEST', chunksize=4,
+                                    schema='compact', **kws))
+        self.assertTrue(all(df.dtypes.equals(chunks[0].dtypes)
+                            for df in chunks))
+        compact = pd.concat(chunks)
+        self.assertEqual(compact.status.dtype, 'category')
+        self.assertEqual(compact.project.dtype, 'object')
+        data = search('project = TEST', **kws)
+        self.assertTrue(compact.astype(data.dtypes.to_dict()).equals(data))
+
+        # the columns with listed categories are categoricals too
+        projects = ['PROJECT{:d}'.format(i) for i in range(7)]
+        chunks = list(search_chunks('project = TEST', chunksize=4,
+                                    schema='compact',
+                                    categories=dict(project=projects), **kws))
+        compact = pd.concat(chunks)
+        self.assertEqual(list(compact.project.cat.categories), projects)
+        self.assertTrue(compact.astype(data.dtypes.to_dict()).equals(data))
+
+        # values without a category aren't lost
+        issues[7]['fields']['status'] = dict(name='Blocked')
+        with self.assertRaises(ValueError):
+            list(search_chunks('project = TEST', chunksize=4,
+                               schema='compact', **kws))
+
+    def test_apply_schema_fixed(self):
+        data = pd.DataFrame(dict(status=['open', 'blocked'],
+                                 project=['A', 'B']))
+        with self.assertRaises(ValueError):
+            apply_schema(data, 'compact', fixed=True)
+        compact = apply_schema(data, 'compact', fixed=True, categories=dict(
+            status=['blocked'], project=['B', 'A', 'C']))
+        self.assertEqual(list(compact.status.cat.categories[-2:]),
+                         ['released', 'blocked'])
+        self.assertEqual(list(compact.project.cat.categories),
+                         ['B', 'A', 'C'])
+        self.assertTrue(compact.astype(object).equals(data))
+        # the categories found in `data` follow the listed ones
+        compact = apply_schema(data, 'compact', categories=dict(project=['B']))
+        self.assertEqual(list(compact.project.cat.categories), ['B', 'A'])
+
+
+class TestIssueStore(StubServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = IssueStore(path=self.tmp.name)
+        self.kws = dict(auth=('', ''), server=self.server, scheme='http')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _sync(self, jql='project = TEST', **kws):
+        return self.store.sync('test', jql, with_delta=True, **self.kws,
+                               **kws)
+
+    def test_full_sync(self):
+        data, delta = self._sync()
+        self.assertEqual(len(data), TOTAL)
+        self.assertTrue(delta.index.equals(data.index))
+        self.assertEqual(data.index.name, 'key')
+        stored, _ = self.store.load('test')
+        self.assertTrue(stored.equals(data))
+
+    def test_delta_sync(self):
+        self._sync()
+        changed = _issue(3)
+        changed['fields']['summary'] = 'Changed'
+        self.serve([changed, _issue(TOTAL)])
+        data, delta = self._sync()
+        self.assertIn('updated >= ', self.httpd.queries[0])
+        self.assertEqual(list(delta.index), ['ISSUE-3', 'ISSUE-25'])
+        self.assertEqual(len(data), TOTAL + 1)
+        self.assertFalse(data.index.duplicated().any())
+        self.assertEqual(data.summary['ISSUE-3'], 'Changed')
+        self.assertEqual(data.summary['ISSUE-4'], 'Issue 4')
+
+    def test_delta_sync_cache(self):
+        cache = DiskCache(path=os.path.join(self.tmp.name, 'cache'))
+        self._sync(cache=cache)
+        for summary in ['Changed', 'Changed again']:
+            changed = _issue(3)
+            changed['fields']['summary'] = summary
+            self.serve([changed])
+            data, delta = self._sync(cache=cache)
+            self.assertEqual(data.summary['ISSUE-3'], summary)
+
+    def test_empty_sync(self):
+        self.serve([])
+        data, delta = self._sync()
+        self.assertTrue(data.empty)
+        data, delta = self._sync()
+        self.assertTrue(data.empty and delta.empty)
+        self.serve([_issue(0)])
+        data, delta = self._sync()
+        self.assertEqual(list(data.index), ['ISSUE-0'])
+
+    def test_full_resync(self):
+        self._sync()
+        self.serve([_issue(i) for i in range(5)])
+        data, delta = self._sync(full=True)
+        self.assertEqual(self.httpd.queries, ['project = TEST'])
+        self.assertEqual(len(data), 5)
+
+    def test_failed_sync(self):
+        self.serve([_issue(i) for i in range(TOTAL)], fail=[10])
+        with self.assertRaises(requests.HTTPError):
+            self._sync()
+        self.assertEqual(self.store.load('test'), (None, None))
+
+    def test_failed_delta_sync(self):
+        self._sync()
+        stored, watermark = self.store.load('test')
+        self.serve([_issue(3)], fail=[0])
+        with self.assertRaises(requests.HTTPError):
+            self._sync()
+        data, since = self.store.load('test')
+        self.assertEqual(since, watermark)
+        self.assertTrue(data.equals(stored))
+
+    def test_unreachable_server(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            server = sock.getsockname()
+        with self.assertRaises(requests.ConnectionError):
+            self.store.sync('test', 'project = TEST', auth=('', ''),
+                            server=server, scheme='http')
+        self.assertEqual(self.store.load('test'), (None, None))
+
+    def test_changed_query(self):
+        self._sync()
+        self.serve([_issue(i) for i in range(5)])
+        data, delta = self._sync('project = OTHER')
+        self.assertEqual(self.httpd.queries, ['project = OTHER'])
+        self.assertEqual(len(data), 5)
+
+
+@unittest.skipIf(async_search is None, 'aiohttp is not installed')
+class TestAsyncSearch(StubServerTestCase):
+
+    def _collect(self, **kws):
+        async def _main():
+            return [item async for item in async_search(
+                'project = TEST', auth=('', ''), server=self.server,
+                scheme='http', **kws)]
+        return asyncio.run(_main())
+
+    def test_async_search(self):
+        issues = self._collect(concurrency=2)
+        keys = sorted(issue['key'] for issue in issues)
+        self.assertEqual(keys, sorted(_issue(i)['key'] for i in range(TOTAL)))
+
+    def test_async_search_frames(self):
+        frames = self._collect(frames=True)
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(sum(len(df) for df in frames), TOTAL)
+        self.assertTrue(all(df.index.name == 'key' for df in frames))
+
+    def test_async_search_fields(self):
+        issues = self._collect(fields=['description'])
+        self.assertTrue(all('description' in issue for issue in issues))
+        issues = self._collect()
+        self.assertFalse(any('description' in issue for issue in issues))
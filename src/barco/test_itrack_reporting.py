@@ -0,0 +1,293 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+from pandas.tseries.offsets import BDay
+
+from .itrack.batch import render_reports, partition, report_key
+from .itrack import reporting
+from .itrack.reporting import add_measures, calculate_trend, Report
+from .itrack.trend import Bins, TRENDS, trend_frame
+from .utils.cache import DiskCache
+
+
+TODAY = date(2018, 3, 15)
+PQMS = dict(P0='A-1', P1='B-2')
+
+
+def _frame():
+    created = pd.to_datetime(['2018-01-01', '2018-01-02', '2018-02-01',
+                              '2018-03-12', None])
+    investigated = pd.to_datetime(['2018-01-10', '2018-02-01', None,
+                                   '2018-03-13', '2018-03-01'])
+    closuredate = pd.to_datetime(['2018-01-29', '2018-01-30', None, None,
+                                  None])
+    return pd.DataFrame(dict(created=created, investigated=investigated,
+                             closuredate=closuredate),
+                         index=list('abcde'))
+
+
+def _expected(data, start, end, n):
+    today = pd.Timestamp(TODAY)
+    met = (data[start].fillna(today) + BDay(n) >= data[end].fillna(today))
+    met = met.astype(np.int64).astype(float)
+    met[data[start] >= today - BDay(n)] = np.nan
+    return met
+
+
+def _history(n=400):
+    rng = np.random.default_rng(1)
+    created = pd.Timestamp('2018-01-01') + pd.to_timedelta(
+        rng.integers(0, 150, n), unit='D')
+    closed = created + pd.to_timedelta(rng.integers(0, 40, n), unit='D')
+    return pd.DataFrame(dict(
+        created=created,
+        closuredate=closed.where(rng.random(n) < 0.6),
+        investigated=created.where(rng.random(n) < 0.5),
+        project=['P{:d}'.format(i % 3) for i in range(n)]
+    ), index=['K-{:d}'.format(i) for i in range(n)])
+
+
+class TestAddMeasures(unittest.TestCase):
+
+    def test_offsets(self):
+        data = _frame()
+        result = add_measures(data, today=TODAY)
+        self.assertEqual(list(result.N), [1] * 5)
+        for name, (start, end, n) in dict(
+                FRT_10=('created', 'investigated', 10),
+                TRT_20=('created', 'closuredate', 20)).items():
+            pd.testing.assert_series_equal(
+                result[name], _expected(data, start, end, n), check_names=False)
+
+    def test_nullable(self):
+        result = add_measures(_frame(), today=TODAY, nullable=True)
+        self.assertEqual(str(result.FRT_10.dtype), 'Int8')
+        self.assertTrue(result.FRT_10.isna().iloc[3])
+
+    def test_custom(self):
+        result = add_measures(
+            _frame(), slas=dict(X_1=('investigated', 'closuredate', 1)),
+            today=TODAY)
+        self.assertEqual(list(result.columns[-2:]), ['N', 'X_1'])
+
+
+class TestTrend(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        created = pd.Timestamp('2018-01-01') + pd.to_timedelta(
+            rng.integers(0, 200, 500), unit='D')
+        closed = created + pd.to_timedelta(rng.integers(0, 40, 500), unit='D')
+        closed = closed.where(rng.random(500) < 0.7)
+        investigated = created + pd.to_timedelta(
+            rng.integers(0, 20, 500), unit='D')
+        self.data = add_measures(
+            pd.DataFrame(dict(created=created, closuredate=closed,
+                              investigated=investigated)),
+            today=date(2018, 6, 1))
+
+    def _expected(self, start):
+        def _timeseries(x='created', y='N', agg='sum'):
+            return (self.data.set_index(x).sort_index().rename_axis('DT')
+                    .resample('B')[y].agg(agg).fillna(0))
+
+        return pd.DataFrame(dict(
+            created=_timeseries(),
+            resolved=_timeseries(x='closuredate'),
+            FRT_10=_timeseries(y='FRT_10', agg='mean'),
+            TRT_20=_timeseries(y='TRT_20', agg='mean')
+        ))[start:]
+
+    def test_resample(self):
+        for start in (date(2018, 1, 1), date(2018, 3, 3)):
+            result = calculate_trend(self.data, start)
+            expected = self._expected(start)
+            assert_frame_equal(result[expected.columns], expected)
+            for column in expected:
+                assert_series_equal(result[column + '_MA'],
+                                    expected[column].rolling(7).mean(),
+                                    check_names=False)
+
+    def test_window(self):
+        result = calculate_trend(self.data, date(2018, 1, 1), window=3)
+        self.assertEqual(list(result.created_MA.isna()[:4]),
+                         [True, True, False, False])
+
+    def test_empty(self):
+        no_dates = self.data.assign(created=pd.NaT, closuredate=pd.NaT)
+        for data in (self.data.iloc[:0], no_dates):
+            result = calculate_trend(data, date(2018, 1, 1))
+            self.assertTrue(result.empty)
+            self.assertEqual(list(result.columns[:4]),
+                             ['created', 'resolved', 'FRT_10', 'TRT_20'])
+
+        # bins without any dates can still be added to
+        bins = Bins(trends=TRENDS).add(self.data.iloc[:0]).add(self.data)
+        assert_frame_equal(trend_frame(bins),
+                           calculate_trend(self.data, None))
+
+
+class TestReport(unittest.TestCase):
+
+    def setUp(self):
+        self.data = _history()
+        self.pqms = PQMS
+
+    def _report(self, data, today):
+        return Report(pqms=self.pqms, start=date(2018, 2, 1)).build(
+            data, today)
+
+    def test_update(self):
+        old, new = self.data.iloc[:350], self.data.iloc[300:].copy()
+        new.iloc[:50, 1] = pd.Timestamp('2018-05-30')
+        today = date(2018, 6, 4)
+        report = self._report(old, date(2018, 5, 28)).update(new, today)
+        expected = self._report(
+            pd.concat([self.data.iloc[:300], new]), today)
+
+        assert_frame_equal(report.trend, expected.trend)
+        assert_frame_equal(report.hist.sort_index(),
+                           expected.hist.sort_index())
+
+    def test_update_empty(self):
+        report = self._report(self.data, date(2018, 5, 28))
+        trend = report.trend
+        report.update(pd.DataFrame(), date(2018, 5, 28))
+        self.assertIs(report.trend, trend)
+
+        today = date(2018, 6, 4)
+        report.update(pd.DataFrame(), today)
+        expected = self._report(self.data, today)
+        assert_frame_equal(report.trend, expected.trend)
+        assert_frame_equal(report.hist.sort_index(),
+                           expected.hist.sort_index())
+
+    def test_sync(self):
+        store = mock.Mock()
+        store.sync.return_value = self.data, pd.DataFrame()
+        report = Report(pqms=self.pqms, start=date(2018, 2, 1))
+        report.sync(store)
+        report.sync(store)
+        self.assertEqual(store.sync.call_args[0][:2],
+                         ('hist', reporting.HIST_JQL.format(date(2018, 2, 1))))
+        self.assertEqual(len(report.hist), len(reporting._since(
+            self.data, date(2018, 2, 1))))
+
+
+class TestLoad(unittest.TestCase):
+
+    def test_session(self):
+        sessions = []
+
+        def _search(jql, session=None, **kws):
+            sessions.append(session)
+            return _history(10)
+
+        with mock.patch.object(reporting.api, 'search', _search), \
+                mock.patch.object(reporting, '_auth', lambda: ('', '')):
+            active, hist = reporting.load(dict(pqms=PQMS))
+        self.assertEqual(len(sessions), 2)
+        self.assertIsNotNone(sessions[0])
+        self.assertIs(sessions[0], sessions[1])
+        self.assertEqual(list(hist.PQM.unique()), ['A-1', 'B-2', 'Other'])
+
+    def test_sync_hist(self):
+        data = _history()
+        store = mock.Mock()
+        store.sync.return_value = data, data.iloc[:50]
+        start = date(2018, 3, 15)
+        hist, delta = reporting.sync_hist(store, start)
+        self.assertEqual(store.sync.call_args[0][1],
+                         reporting.HIST_JQL.format(date(2018, 3, 1)))
+        since = (data.created >= '2018-03-15') | (
+            data.closuredate >= '2018-03-15')
+        assert_frame_equal(hist, data[since])
+        assert_frame_equal(delta, data.iloc[:50][since.iloc[:50]])
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_render_reports(self):
+        report = Report(pqms=PQMS, start=date(2018, 2, 1)).build(
+            _history(), date(2018, 6, 4))
+        active = report.hist.iloc[:30].assign(
+            status='Open', priority='P1', severity='S2', age=1, idle=1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = render_reports(active, report.hist, by='PQM',
+                                    directory=directory,
+                                    formats=('png', 'svg'), processes=2)
+            self.assertEqual(sorted(result), ['A-1', 'B-2', 'Other'])
+            for filenames in result.values():
+                self.assertEqual(len(filenames), 2)
+                for filename in filenames:
+                    self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_render_reports_active_only(self):
+        report = Report(pqms=PQMS, start=date(2018, 2, 1)).build(
+            _history(), date(2018, 6, 4))
+        active = report.hist.iloc[:30].assign(
+            status='Open', priority='P1', severity='S2', age=1, idle=1)
+        # a PQM with active issues, but without any history
+        active.loc[active.index[:5], 'PQM'] = 'C-3'
+
+        names = [name for name, _, _ in partition(active, report.hist)]
+        self.assertEqual(names, ['A-1', 'B-2', 'C-3', 'Other'])
+        with tempfile.TemporaryDirectory() as directory:
+            result = render_reports(active, report.hist, by='PQM',
+                                    directory=directory, formats=('svg', ),
+                                    processes=1)
+            self.assertEqual(sorted(result), names)
+            for (filename, ) in result.values():
+                self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_cache(self):
+        report = Report(pqms=PQMS, start=date(2018, 2, 1)).build(
+            _history(), date(2018, 6, 4))
+        active = report.hist.iloc[:30].assign(
+            status='Open', priority='P1', severity='S2', age=1, idle=1)
+        start = date(2018, 2, 1)
+        kws = dict(by='project', formats=('svg', ), start=start, processes=1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(path=os.path.join(directory, 'cache'))
+            render_reports(active, report.hist, directory=directory,
+                           cache=cache, **kws)
+
+            # unchanged partitions are served from the cache
+            for name, data, trend in partition(active, report.hist,
+                                               'project', start):
+                key = report_key(data, trend, dict(name='project: ' + name))
+                self.assertIsNotNone(cache.get(key + '.svg'))
+                cache.set(key + '.svg', name.encode('utf-8'))
+
+            active.loc[active.project == 'P0', 'status'] = 'Closed'
+            result = render_reports(active, report.hist, directory=directory,
+                                    cache=cache, **kws)
+            for name, (filename, ) in result.items():
+                with open(filename, 'rb') as fp:
+                    content = fp.read()
+                if name == 'P0':
+                    self.assertIn(b'<svg', content)
+                else:
+                    self.assertEqual(content, name.encode('utf-8'))
+
+    def test_report_key(self):
+        active = add_measures(_history(20), today=TODAY)
+        trend = calculate_trend(active, start=date(2018, 1, 1))
+        key = report_key(active, trend, dict(name='all'))
+        self.assertEqual(report_key(active, trend, dict(name='all')), key)
+        self.assertNotEqual(report_key(active, trend, dict(name='P0')), key)
+        with mock.patch.object(reporting, 'TODAY', date(2018, 3, 16)):
+            self.assertNotEqual(report_key(active, trend, dict(name='all')),
+                                key)
+
+    def test_formats(self):
+        with self.assertRaises(ValueError):
+            render_reports(None, None, formats=('bmp', ))
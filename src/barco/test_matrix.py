@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .matrix import (calendar_days, calendar_layout, bin_counts,
+                     count_colors, matrix_svg, matrix_svgs, matrix_page,
+                     matrix_chart, write_svg, write_page)
+
+
+class TestMatrix(unittest.TestCase):
+
+    def test_calendar_days(self):
+        dates = calendar_days(date(2018, 3, 15), days=10)
+        self.assertEqual(str(dates[0]), '2018-03-05')
+        self.assertEqual(str(dates[-1]), '2018-03-15')
+
+    def test_bin_counts(self):
+        dates = calendar_days(date(2018, 3, 15), days=10)
+        value_counts = pd.Series(
+            [1, 2, 3], index=pd.to_datetime(['2018-03-01', '2018-03-05',
+                                             '2018-03-15']))
+        counts = bin_counts(value_counts, dates)
+        self.assertEqual(counts.dtype, np.int64)
+        self.assertEqual(counts.sum(), 5)
+        self.assertEqual((counts[0], counts[-1]), (2, 3))
+
+    def test_bin_events(self):
+        dates = calendar_days(date(2018, 3, 15), days=10)
+        events = pd.to_datetime(['2018-03-01 08:00', '2018-03-05 10:00',
+                                 '2018-03-05 12:00', '2018-03-15 09:00',
+                                 None])
+        expected = [2] + [0] * 9 + [1]
+        self.assertEqual(bin_counts(pd.Series(events), dates).tolist(),
+                         expected)
+        self.assertEqual(bin_counts(iter(events), dates).tolist(), expected)
+        self.assertEqual(
+            bin_counts((d.date() for d in events.dropna()), dates).tolist(),
+            expected)
+
+    def test_count_colors(self):
+        counts = np.array([0, 1, 3, 5, 9, 10, 100])
+        self.assertEqual(count_colors(counts).tolist(), [0, 1, 2, 3, 3, 4, 4])
+
+    def test_quantile_colors(self):
+        counts = np.array([0, 1, 2, 3, 4, 100])
+        self.assertEqual(count_colors(counts, 'quantile').tolist(),
+                         [0, 1, 2, 3, 4, 4])
+        with self.assertRaises(ValueError):
+            count_colors(counts, 'median')
+
+    def test_window(self):
+        svg = matrix_svg(pd.Series(pd.to_datetime(['2016-01-04'])),
+                         display=False, end=date(2018, 3, 15), days=3 * 365)
+        self.assertIn('data-count="1" data-date="2016-01-04"', svg)
+        self.assertTrue(svg.startswith('<svg width="1922"'))
+
+    def test_svg(self):
+        layout = calendar_layout(date(2018, 3, 15))
+        self.assertIs(layout, calendar_layout(date(2018, 3, 15)))
+        svg = layout.render(np.zeros(len(layout.dates), dtype=np.int64))
+        self.assertEqual(svg.count('<rect'), len(layout.dates))
+        self.assertEqual(svg.count('fill="#eee"'), len(layout.dates))
+        self.assertTrue(svg.endswith('</svg>'))
+
+    def test_batch(self):
+        series = dict(
+            a=pd.Series([4], index=pd.to_datetime(['2018-03-15'])),
+            b=pd.Series([20], index=pd.to_datetime(['2018-03-14'])))
+        svgs = matrix_svgs(series, end=date(2018, 3, 15))
+        self.assertIn('fill="#7bc96f" data-count="4" data-date="2018-03-15"',
+                      svgs['a'])
+        self.assertIn('fill="#196127" data-count="20" data-date="2018-03-14"',
+                      svgs['b'])
+        page = matrix_page(series, end=date(2018, 3, 15))
+        self.assertEqual(page.count('<svg'), 2)
+        self.assertEqual(page.count('<style>'), 1 + 2)
+
+    def test_write(self):
+        series = dict(a=pd.Series(pd.to_datetime(['2018-03-15'])))
+        kws = dict(end=date(2018, 3, 15))
+        stream = io.StringIO()
+        write_svg(stream, series['a'], **kws)
+        self.assertEqual(stream.getvalue(),
+                         matrix_svg(series['a'], display=False, **kws))
+        self.assertIn(stream.getvalue(),
+                      matrix_chart(series['a'], 'a', display=False, **kws))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'page.html')
+            write_page(filename, series, **kws)
+            with open(filename, encoding='utf-8') as fp:
+                self.assertEqual(fp.read(), matrix_page(series, **kws))
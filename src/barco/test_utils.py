@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from .utils.cache import DiskCache
+from .utils.pandas import (FrameSpec, to_dataframe, set_index, rename,
+                           to_datetime, astype)
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(path=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('foo'))
+        self.cache.set('foo', b'bar' * 100)
+        self.assertEqual(self.cache.get('foo'), b'bar' * 100)
+
+    def test_ttl(self):
+        self.cache.ttl = 60
+        self.cache.set('foo', b'bar')
+        filename = self.cache._filename('foo')
+        mtime = os.stat(filename).st_mtime - 120
+        os.utime(filename, (mtime, mtime))
+        self.assertIsNone(self.cache.get('foo'))
+
+    def test_evict_least_recently_used(self):
+        data = os.urandom(1000)
+        self.cache.max_size = 2500
+        for i, key in enumerate(('a', 'b')):
+            self.cache.set(key, data)
+            filename = self.cache._filename(key)
+            os.utime(filename, (i, i))
+        self.cache.get('a')
+        self.cache.set('c', data)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+
+class TestFrameSpec(unittest.TestCase):
+
+    RECORDS = [dict(key='A-1', date='2018-01-02', n=1),
+               dict(key='A-2', date='bad', n=2, extra='x')]
+
+    def _frame(self):
+        @to_datetime(['day'], format='%Y-%m-%d', errors='coerce')
+        @rename(columns=dict(date='day'))
+        @set_index('key')
+        @to_dataframe
+        def _func(data):
+            return data
+        return _func
+
+    def test_lowered(self):
+        func = self._frame()
+        self.assertEqual([step[0] for step in func._frame_spec.steps],
+                         ['index', 'rename', 'datetime'])
+
+        expected = pd.DataFrame(self.RECORDS).set_index('key').rename(
+            columns=dict(date='day'))
+        expected['day'] = pd.to_datetime(expected.day, format='%Y-%m-%d',
+                                         errors='coerce')
+        assert_frame_equal(func(self.RECORDS), expected)
+        columns = {k: list(v.values()) for k, v in
+                   pd.DataFrame(self.RECORDS).to_dict().items()}
+        assert_frame_equal(func(columns), expected)
+        self.assertTrue(func([]).empty)
+
+    def test_not_lowered(self):
+        @rename(columns=dict(date='day'))
+        @set_index('key', drop=False)
+        @to_dataframe
+        def _func(data):
+            return data
+
+        result = _func(self.RECORDS)
+        self.assertEqual(result.index.name, 'key')
+        self.assertEqual(list(result.columns[:2]), ['key', 'day'])
+
+    def test_astype(self):
+        @astype(dict(n='int16'))
+        @to_dataframe
+        def _func(data):
+            return data
+
+        self.assertEqual(_func(self.RECORDS).n.dtype, 'int16')
+        self.assertEqual(
+            FrameSpec().astype(dict(n='int16')).apply(
+                pd.DataFrame(self.RECORDS)).n.dtype, 'int16')
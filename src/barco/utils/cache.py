@@ -0,0 +1,97 @@
+"""Provides a size bounded on-disk cache."""
+import os
+import time
+import zlib
+import hashlib
+
+from traitlets import HasTraits, Unicode, Float, Int
+
+
+class DiskCache(HasTraits):
+    """
+    A cache storing compressed byte strings on disk, one file per key.
+
+    Entries older than `ttl` seconds are treated as missing. When the total size
+    of the entries exceeds `max_size` bytes, the least recently used entries are
+    evicted. The last use of an entry is tracked through its access time, its
+    modification time is the time it was stored.
+    """
+
+    path = Unicode(help='Directory to store the cache entries in')
+    ttl = Float(None, allow_none=True,
+                help='Time to live of an entry in seconds, `None` for no limit')
+    max_size = Int(256 * 1024 ** 2, help='Max total size of entries in bytes')
+
+    def _filename(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def get(self, key):
+        """
+        Returns the byte string stored for `key`, or `None` when missing or
+        expired.
+
+        Parameters
+        ----------
+        key : unicode
+            Key of the entry.
+        """
+        filename = self._filename(key)
+        try:
+            mtime = os.stat(filename).st_mtime
+            now = time.time()
+            if self.ttl is not None and now - mtime > self.ttl:
+                os.remove(filename)
+                return None
+            with open(filename, 'rb') as fp:
+                data = fp.read()
+            os.utime(filename, (now, mtime))
+        except FileNotFoundError:
+            return None
+        return zlib.decompress(data)
+
+    def set(self, key, data):
+        """
+        Stores byte string `data` for `key`, evicting the least recently used
+        entries when the cache grows beyond `max_size`.
+
+        Parameters
+        ----------
+        key : unicode
+            Key of the entry.
+        data : bytes
+            Byte string to store.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        filename = self._filename(key)
+        with open(filename + '.tmp', 'wb') as fp:
+            fp.write(zlib.compress(data))
+        os.replace(filename + '.tmp', filename)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries exceeding `max_size`."""
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, filename in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """Removes all entries."""
+        if os.path.isdir(self.path):
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        os.remove(entry.path)
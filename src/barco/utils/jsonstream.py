@@ -0,0 +1,105 @@
+"""Provides functions to decode JSON documents, optionally as a stream."""
+import re
+import json
+import codecs
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+# Whitespace allowed between JSON tokens
+_WS = re.compile(r'[ \t\n\r]*')
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """A buffer of decoded text read from an iterable of byte strings."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder('utf-8')().decode
+        self.text = ''
+        self.pos = 0
+
+    def fill(self):
+        """Appends the next chunk to the buffer, returns `False` at the end."""
+        chunk = next(self._chunks, None)
+        text = self._decode(chunk or b'', final=chunk is None)
+        self.text = self.text[self.pos:] + text
+        self.pos = 0
+        return chunk is not None or len(text) > 0
+
+    def peek(self):
+        """Returns the next non-whitespace character."""
+        while True:
+            self.pos = _WS.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    def expect(self, chars):
+        """Consumes the next non-whitespace character, being one of `chars`."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError('Expected one of {!r} at {:d}, got {!r}'.format(
+                chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Consumes and returns the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number at the end of the buffer might continue in the next chunk
+            if end == len(self.text) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iterload(chunks, key):
+    """
+    Yields the `(name, value)` members of the JSON object read from `chunks`,
+    decoding it incrementally. The elements of array member `key` are yielded
+    one at a time, as `(key, element)` tuples, so the array never needs to be
+    held in memory as a whole.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Iterable of byte strings, e.g. the `iter_content` of a response.
+    key : unicode
+        Name of the array member to yield per element.
+    """
+    buf = _Buffer(chunks)
+    buf.expect('{')
+    if buf.peek() == '}':
+        return
+
+    while True:
+        name = buf.value()
+        buf.expect(':')
+        if name == key and buf.peek() == '[':
+            buf.expect('[')
+            if buf.peek() == ']':
+                buf.expect(']')
+            else:
+                while True:
+                    yield name, buf.value()
+                    if buf.expect(',]') == ']':
+                        break
+        else:
+            yield name, buf.value()
+
+        if buf.expect(',}') == '}':
+            return
+
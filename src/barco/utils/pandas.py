@@ -1,15 +1,157 @@
 """Provides commonly used pandas related utility and decorator functions."""
 import functools
+from collections.abc import Mapping
+
+import numpy as np
 import pandas as pd
+from traitlets import HasTraits, List
+
+
+def _records_to_columns(records):
+    # columns in order of first appearance, missing values as NaN, the same
+    # way `pd.DataFrame` reads records
+    names = dict.fromkeys(name for record in records for name in record)
+    return {name: [record.get(name, np.nan) for record in records]
+            for name in names}
+
+
+class FrameSpec(HasTraits):
+    """
+    A specification of a DataFrame, i.e. the steps to apply to its records or
+    columns, which builds the DataFrame in a single construction.
+
+    The steps work on the columns before they're assembled into a DataFrame,
+    so setting the index, renaming the columns and converting their types
+    don't copy the frame in between. The decorators in this module lower to
+    a `FrameSpec` when they decorate a function decorated with `to_dataframe`.
+    """
+
+    steps = List(help='Steps to apply to the columns, in order')
+
+    def _step(self, *step):
+        return FrameSpec(steps=self.steps + [step])
+
+    def set_index(self, keys):
+        """Returns the spec with the column(s) `keys` set as index."""
+        return self._step('index', keys)
+
+    def rename(self, columns):
+        """Returns the spec with the columns renamed by mapping `columns`."""
+        return self._step('rename', columns)
+
+    def to_datetime(self, columns, **kws):
+        """Returns the spec with the `columns` converted to datetimes."""
+        return self._step('datetime', list(columns), kws)
+
+    def astype(self, dtypes):
+        """Returns the spec with the columns converted to mapping `dtypes`."""
+        return self._step('astype', dict(dtypes))
+
+    def build(self, data):
+        """
+        Returns the DataFrame of `data` as specified.
+
+        Parameters
+        ----------
+        data -- dict or list
+            Mapping of columns, or list of records mappings; any other data
+            is read by `pd.DataFrame` first, and the steps are then applied
+            to the frame
+        """
+        if isinstance(data, Mapping):
+            columns = dict(data)
+        elif isinstance(data, list) and all(isinstance(record, Mapping)
+                                            for record in data):
+            columns = _records_to_columns(data)
+        else:
+            return self.apply(pd.DataFrame(data))
+
+        # columns of a mapping may be Series, which must not be aligned
+        columns = {name: values.array if isinstance(values, pd.Series)
+                   else values for name, values in columns.items()}
+        if not columns or not len(next(iter(columns.values()))):
+            return self.apply(pd.DataFrame(columns))
+
+        index = None
+        for step in self.steps:
+            if step[0] == 'index':
+                keys = step[1] if isinstance(step[1], list) else [step[1]]
+                arrays = [columns.pop(key) for key in keys]
+                index = (pd.Index(arrays[0], name=keys[0]) if len(keys) == 1
+                         else pd.MultiIndex.from_arrays(arrays, names=keys))
+            elif step[0] == 'rename':
+                rename = step[1] if callable(step[1]) else (
+                    lambda name, mapping=step[1]: mapping.get(name, name))
+                columns = {rename(name): values
+                           for name, values in columns.items()}
+            elif step[0] == 'datetime':
+                for name in step[1]:
+                    columns[name] = pd.to_datetime(columns[name], **step[2])
+            elif step[0] == 'astype':
+                for name, dtype in step[1].items():
+                    columns[name] = pd.array(columns[name], dtype=dtype)
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def apply(self, obj):
+        """
+        Returns DataFrame `obj` with the steps applied, one at a time.
+
+        Parameters
+        ----------
+        obj -- pandas.DataFrame
+        """
+        for step in self.steps:
+            if step[0] == 'index' and not obj.empty:
+                obj = obj.set_index(step[1])
+            elif step[0] == 'rename':
+                obj = obj.rename(columns=step[1])
+            elif step[0] == 'datetime' and not obj.empty:
+                obj = obj.assign(**{
+                    column: pd.to_datetime(obj[column], **step[2])
+                    for column in step[1]
+                })
+            elif step[0] == 'astype':
+                obj = obj.astype(step[1])
+        return obj
+
+
+def _lower(func, step):
+    """
+    Returns the function building the DataFrame of the `FrameSpec` of `func`
+    with `step` added, or `None` when `func` has no `FrameSpec`.
+    """
+    # `functools.wraps` copies the attributes of `func` to wrappers changing
+    # its DataFrame, so these must refer to `func` itself
+    if getattr(func, '_frame_wrapper', None) is not func:
+        return None
+
+    spec = step(func._frame_spec)
+    source = func._frame_source
+
+    @functools.wraps(func)
+    def _wrapper(*args, **kwargs):
+        return spec.build(source(*args, **kwargs))
+
+    return _frame_wrapper(_wrapper, spec, source)
+
+
+def _frame_wrapper(wrapper, spec, source):
+    # marks `wrapper` as building the DataFrame of `spec` from `source`
+    wrapper._frame_spec = spec
+    wrapper._frame_source = source
+    wrapper._frame_wrapper = wrapper
+    return wrapper
 
 
 def to_dataframe(func):
     """Converts the result of `func` to a pandas DataFrame."""
+    spec = FrameSpec()
 
     @functools.wraps(func)
     def _wrapper(*args, **kwargs):
-        return pd.DataFrame(func(*args, **kwargs))
-    return _wrapper
+        return spec.build(func(*args, **kwargs))
+
+    return _frame_wrapper(_wrapper, spec, func)
 
 
 def set_index(keys, **kws):
@@ -23,11 +165,15 @@ def set_index(keys, **kws):
     """
 
     def _decorator(func):
+        lowered = None if kws else _lower(
+            func, lambda spec: spec.set_index(keys))
+        if lowered is not None:
+            return lowered
 
         @functools.wraps(func)
         def _wrapper(*args, **kwargs):
             obj = func(*args, **kwargs)
-            if isinstance(obj, pd.DataFrame):
+            if isinstance(obj, pd.DataFrame) and not obj.empty:
                 return obj.set_index(keys, **kws)
             return obj
 
@@ -48,6 +194,10 @@ def rename(index=None, columns=None, **kws):
     """
 
     def _decorator(func):
+        lowered = None if index is not None or kws else _lower(
+            func, lambda spec: spec.rename(columns or {}))
+        if lowered is not None:
+            return lowered
 
         @functools.wraps(func)
         def _wrapper(*args, **kwargs):
@@ -72,11 +222,14 @@ def to_datetime(columns, **kws):
         dict-like or functions are transformations to apply to that axis' value
     """
     def _decorator(func):
+        lowered = _lower(func, lambda spec: spec.to_datetime(columns, **kws))
+        if lowered is not None:
+            return lowered
 
         @functools.wraps(func)
         def _wrapper(*args, **kwargs):
             obj = func(*args, **kwargs)
-            if isinstance(obj, pd.DataFrame):
+            if isinstance(obj, pd.DataFrame) and not obj.empty:
                 return obj.assign(**{
                     column: lambda df, col=column: pd.to_datetime(df[col], **kws)
                     for column in columns
@@ -85,3 +238,28 @@ def to_datetime(columns, **kws):
 
         return _wrapper
     return _decorator
+
+
+def astype(dtypes):
+    """
+    Cast the columns of the DataFrame to the dtypes of mapping `dtypes`.
+
+    Parameters
+    ----------
+    dtypes -- dict
+        Mapping of column labels to dtypes
+    """
+    def _decorator(func):
+        lowered = _lower(func, lambda spec: spec.astype(dtypes))
+        if lowered is not None:
+            return lowered
+
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            obj = func(*args, **kwargs)
+            if isinstance(obj, pd.DataFrame):
+                return obj.astype(dtypes)
+            return obj
+
+        return _wrapper
+    return _decorator
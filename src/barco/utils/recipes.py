@@ -34,6 +34,8 @@ def compose(*funcs):
     def _inner(*args, **kwargs):
         return reduce(_apply, rest, first(*args, **kwargs))
 
+    # allow `compile_converters` to flatten the composition
+    _inner.funcs = funcs
     return _inner
 
 
@@ -69,9 +71,103 @@ def itemgetter(item, default=None):
 
     def _inner(obj):
         return obj.get(item, default) if hasattr(obj, 'get') else default
+
+    # allow `compile_converters` to inline the item getter
+    _inner.item = item
+    _inner.default = default
     return _inner
 
 
+def _steps(func):
+    """Returns the functions composed into `func`, flattening compositions."""
+    funcs = getattr(func, 'funcs', None)
+    if funcs is None:
+        return [func]
+    return [step for f in funcs for step in _steps(f)]
+
+
+def _convert_lines(namespace, i, func, indent):
+    """
+    Returns the source lines converting `value` with `func`, the `i`th
+    converter, adding the objects they refer to to `namespace`.
+    """
+    lines = []
+    for j, step in enumerate(_steps(func)):
+        name = '_f{:d}_{:d}'.format(i, j)
+        if step is ident:
+            continue
+        elif hasattr(step, 'item') and hasattr(step, 'default'):
+            namespace[name + 'i'] = step.item
+            namespace[name + 'd'] = step.default
+            lines.append(
+                'value = (value.get({0}i, {0}d) '
+                'if hasattr(value, "get") else {0}d)'.format(name))
+        else:
+            namespace[name] = step
+            lines.append('value = {0}(value)'.format(name))
+    return [indent + line for line in lines]
+
+
+def compile_converters(converters):
+    """
+    Returns a function converting the values of a mapping, equivalent to
+    `{k: f(obj[k]) for k, f in converters.items() if k in obj}`, compiled into a
+    single function: compositions are flattened, `ident` steps are dropped and
+    `itemgetter` steps are inlined.
+
+    >>> convert = compile_converters(dict(foo=compose(itemgetter('a'), str.upper),
+    ...                                   bar=ident))
+    >>> convert(dict(foo=dict(a='x'), baz=1))
+    {'foo': 'X'}
+    """
+    namespace = {}
+    lines = ['def convert(obj):', '    data = {}']
+    for i, (key, func) in enumerate(converters.items()):
+        namespace['_k{:d}'.format(i)] = key
+        lines.append('    if _k{0:d} in obj:'.format(i))
+        lines.append('        value = obj[_k{0:d}]'.format(i))
+        lines.extend(_convert_lines(namespace, i, func, ' ' * 8))
+        lines.append('        data[_k{0:d}] = value'.format(i))
+    lines.append('    return data')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['convert']
+
+
+def compile_column_converters(converters, missing=None):
+    """
+    Returns a function converting the values of an iterable of mappings into
+    columns, i.e. a mapping of keys to lists of values in order of first
+    appearance, with `missing` where a mapping lacks a key. It's compiled like
+    `compile_converters`, and appends the converted values to the columns
+    directly instead of converting every mapping into a new one.
+
+    >>> convert = compile_column_converters(
+    ...     dict(foo=compose(itemgetter('a'), str.upper), bar=ident))
+    >>> convert([dict(foo=dict(a='x')), dict(bar=1, baz=2)])
+    {'foo': ['X', None], 'bar': [None, 1]}
+    """
+    namespace = dict(_missing=missing)
+    lines = ['def convert(objs):', '    columns = {}']
+    lines.extend('    _c{:d} = None'.format(i) for i in range(len(converters)))
+    lines.extend(['    n = 0', '    for obj in objs:'])
+    for i, (key, func) in enumerate(converters.items()):
+        namespace['_k{:d}'.format(i)] = key
+        lines.append('        if _k{0:d} in obj:'.format(i))
+        lines.append('            value = obj[_k{0:d}]'.format(i))
+        lines.extend(_convert_lines(namespace, i, func, ' ' * 12))
+        lines.append('            if _c{0:d} is None:'.format(i))
+        lines.append('                _c{0:d} = columns[_k{0:d}] = '
+                     '[_missing] * n'.format(i))
+        lines.append('            _c{0:d}.append(value)'.format(i))
+        lines.append('        elif _c{0:d} is not None:'.format(i))
+        lines.append('            _c{0:d}.append(_missing)'.format(i))
+    lines.extend(['        n += 1', '    return columns'])
+
+    exec('\n'.join(lines), namespace)
+    return namespace['convert']
+
+
 def snake_case(string):
     """Converts CamelCase `string` to snake_case."""
     return re.sub(